@@ -1,10 +1,211 @@
-from deepface import DeepFace
 import cv2
 import os
 import json
-import pandas as pd
 from datetime import datetime
 import glob
+import time
+
+# Emotion labels in the order DeepFace reports them
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+def get_output_paths(video_name, create=True):
+    """Create Output_Files/<video_name>/ (unless create=False) and return (output_dir, json_path, csv_path)"""
+    
+    main_output_dir = "Output_Files"
+    output_dir = os.path.join(main_output_dir, video_name)
+    if create:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    json_output = os.path.join(output_dir, f"emotion_analysis_{video_name}.json")
+    csv_output = os.path.join(output_dir, f"emotion_analysis_{video_name}.csv")
+    return output_dir, json_output, csv_output
+
+def analyze_frame_emotion(frame, frame_number, fps, emotion_backend="tensorflow", crop_cache=None):
+    """
+    Run emotion analysis on one frame and return a result record (or None)
+    
+    emotion_backend: "tensorflow" (DeepFace), "onnx" or "onnx-int8" (see onnx_emotion.py)
+    crop_cache: optional face_cache.PerceptualHashCache to skip near-identical faces
+    """
+    
+    if crop_cache is not None:
+        from face_cache import classify_with_cache
+        
+        cached_result = classify_with_cache(frame, emotion_backend, crop_cache)
+        result = [cached_result] if cached_result else None
+    elif emotion_backend == "tensorflow":
+        # Imported lazily: TensorFlow startup is only paid when this backend is used
+        from deepface import DeepFace
+        
+        result = DeepFace.analyze(
+            img_path=frame, 
+            actions=['emotion'], 
+            enforce_detection=False,
+            silent=True
+        )
+    else:
+        from onnx_emotion import get_onnx_classifier
+        
+        result = [get_onnx_classifier(emotion_backend).analyze(frame)]
+    
+    if not result:
+        return None
+    
+    return {
+        "frame_number": frame_number,
+        "timestamp_seconds": frame_number / fps,  # Use actual FPS
+        "dominant_emotion": result[0]['dominant_emotion'],
+        "emotions": {
+            emotion: float(score) 
+            for emotion, score in result[0]['emotion'].items()
+        }
+    }
+
+_keras_emotion_model = None
+
+def build_keras_emotion_model():
+    """DeepFace's Keras emotion model (48x48 grayscale in, 7 scores out), loaded once"""
+    
+    global _keras_emotion_model
+    if _keras_emotion_model is None:
+        from deepface import DeepFace
+        
+        # build_model grew a task argument in newer DeepFace releases
+        try:
+            emotion_model = DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+        except TypeError:
+            emotion_model = DeepFace.build_model("Emotion")
+        _keras_emotion_model = getattr(emotion_model, "model", emotion_model)
+    return _keras_emotion_model
+
+def emotion_model_input(face_gray):
+    """Grayscale face crop -> 48x48 float32 in [0, 1], padded to square like DeepFace does"""
+    
+    import numpy as np
+    
+    face = face_gray.astype(np.float32)
+    if face_gray.dtype == np.uint8:
+        face /= 255.0
+    
+    height, width = face.shape[:2]
+    side = max(height, width)
+    if height != width:
+        padded = np.zeros((side, side), dtype=np.float32)
+        top, left = (side - height) // 2, (side - width) // 2
+        padded[top:top + height, left:left + width] = face
+        face = padded
+    return cv2.resize(face, (48, 48))
+
+def extract_aligned_face_gray(frame):
+    """Grayscale face crop as DeepFace's opencv backend produces it (detected and eye-aligned)"""
+    
+    import numpy as np
+    from deepface import DeepFace
+    
+    detected = DeepFace.extract_faces(
+        img_path=frame,
+        detector_backend='opencv',
+        enforce_detection=False,
+        align=True
+    )
+    # extract_faces returns RGB floats in [0, 1]
+    return cv2.cvtColor(detected[0]['face'].astype(np.float32), cv2.COLOR_RGB2GRAY)
+
+def analyze_frames_emotion_batch(frames, frame_numbers, fps_values, emotion_backend="tensorflow"):
+    """
+    Detect one face per frame, then classify all faces with a single batched model call
+    
+    Returns one entry per frame: a result record, or the exception raised for that frame.
+    """
+    
+    import numpy as np
+    
+    outputs = [None] * len(frames)
+    faces = []
+    face_indexes = []
+    
+    if emotion_backend != "tensorflow":
+        from onnx_emotion import get_onnx_classifier
+        classifier = get_onnx_classifier(emotion_backend)
+    
+    # Detection is per frame; only the classifier runs batched
+    for i, frame in enumerate(frames):
+        try:
+            if emotion_backend == "tensorflow":
+                face_gray = extract_aligned_face_gray(frame)
+            else:
+                face_gray = classifier.detect_face(frame)
+            faces.append(emotion_model_input(face_gray))
+            face_indexes.append(i)
+        except Exception as e:
+            outputs[i] = e
+    
+    if not faces:
+        return outputs
+    
+    batch = np.stack(faces)[..., np.newaxis]
+    try:
+        if emotion_backend == "tensorflow":
+            predictions = build_keras_emotion_model().predict(batch, verbose=0)
+        else:
+            predictions = classifier.predict_batch(batch)
+    except Exception as e:
+        for i in face_indexes:
+            outputs[i] = e
+        return outputs
+    
+    for i, scores in zip(face_indexes, predictions):
+        scores = 100 * scores / scores.sum()
+        emotions = {emotion: float(score) for emotion, score in zip(EMOTION_LABELS, scores)}
+        outputs[i] = {
+            "frame_number": frame_numbers[i],
+            "timestamp_seconds": frame_numbers[i] / fps_values[i],
+            "dominant_emotion": max(emotions, key=emotions.get),
+            "emotions": emotions
+        }
+    return outputs
+
+def save_analysis_results(results, video_path, json_output, csv_output, extra_info=None):
+    """
+    Save analysis results to JSON and CSV in the standard layout
+    
+    results may be a results_store.FrameResultBuffer, a RESULT_DTYPE array or a
+    list of result dicts; the JSON/CSV schema is produced here from the rows.
+    """
+    
+    from results_store import as_result_rows, rows_to_results, rows_to_dataframe, write_results_store
+    
+    rows = as_result_rows(results)
+    
+    video_info = {
+        "file_path": video_path,
+        "total_frames_analyzed": len(rows),
+        "analysis_date": datetime.now().isoformat()
+    }
+    if extra_info:
+        video_info.update(extra_info)
+    
+    # Save results to JSON
+    with open(json_output, 'w', encoding='utf-8') as f:
+        json.dump({
+            "video_info": video_info,
+            "results": rows_to_results(rows)
+        }, f, indent=2, ensure_ascii=False)
+    
+    # Save results to CSV
+    if len(rows):
+        df = rows_to_dataframe(rows)
+        df.to_csv(csv_output, index=False, encoding='utf-8')
+        
+        # Save fixed-width binary store for memory-mapped time-range queries
+        bin_output = os.path.splitext(json_output)[0] + ".bin"
+        write_results_store(rows, bin_output)
+        
+        print(f"\n✅ Results saved:")
+        print(f"   📄 JSON: {json_output}")
+        print(f"   📊 CSV:  {csv_output}")
+        print(f"   📦 BIN:  {bin_output}")
+        print(f"   📈 Analyzed {len(rows)} time points")
 
 def list_available_videos():
     """List all available video files and let user choose"""
@@ -71,9 +272,17 @@ def list_available_videos():
             print("\n👋 User cancelled operation")
             return None
 
-def analyze_video_with_output(video_path=None):
+def analyze_video_with_output(video_path=None, emotion_backend="tensorflow", crop_cache=None,
+                              generate_video=None):
     """
     Analyze video and save results to files
+    
+    video_path may be a local file or an http(s) URL; URLs are streamed with
+    range requests and read-ahead (see remote_input.py) instead of copied first.
+    emotion_backend selects the emotion classifier: "tensorflow", "onnx" or "onnx-int8"
+    crop_cache (face_cache.PerceptualHashCache) reuses scores for near-identical faces
+    generate_video=False skips the DeepFace.stream video (see render_video.py);
+    the default (None) renders local files only, since rendering a URL reads it twice
     """
     
     # If no video path provided, let user choose
@@ -83,130 +292,154 @@ def analyze_video_with_output(video_path=None):
             print("❌ No video file selected, program exits")
             return
     
-    # Create output directory based on video filename
-    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    from remote_input import is_remote_url, remote_video_name
     
-    # Create unified main output directory
-    main_output_dir = "Output_Files"
-    os.makedirs(main_output_dir, exist_ok=True)
+    is_remote = is_remote_url(video_path)
+    if generate_video is None:
+        generate_video = not is_remote
     
-    # Create independent subdirectory for each video
-    output_dir = os.path.join(main_output_dir, video_name)
-    os.makedirs(output_dir, exist_ok=True)
+    # Create output directory based on video filename
+    if is_remote:
+        video_name = remote_video_name(video_path)
+    else:
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
     
-    # Output file paths (based on video name)
-    json_output = os.path.join(output_dir, f"emotion_analysis_{video_name}.json")
-    csv_output = os.path.join(output_dir, f"emotion_analysis_{video_name}.csv")
+    # Create independent subdirectory for each video under Output_Files
+    output_dir, json_output, csv_output = get_output_paths(video_name)
     video_output = os.path.join(output_dir, f"analyzed_{video_name}.mp4")
     
     print("=== Starting video emotion analysis and saving results ===")
     print(f"Input video: {video_path}")
     print(f"Output directory: {output_dir}")
+    print(f"Emotion backend: {emotion_backend}")
     
     # Method 1: Frame-by-frame analysis and save to JSON/CSV
-    if os.path.exists(video_path):
-        cap = cv2.VideoCapture(video_path)
-        frame_count = 0
-        results = []
-        
-        # Get video FPS to calculate accurate timestamps
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        if fps <= 0:
-            fps = 30.0  # Default fallback
-        
-        # Calculate analysis interval: every 0.1 seconds
-        # For 30fps video: analyze every 3 frames (30fps * 0.1s = 3 frames)
-        analysis_interval = max(1, int(fps * 0.1))  # At least every frame
+    if is_remote or os.path.exists(video_path):
+        from results_store import FrameResultBuffer
         
-        # Calculate max frames for 15 seconds
-        max_frames = int(fps * 15)  # 15 seconds of video
+        analysis_started = time.monotonic()
+        first_result_seconds = None
         
-        print(f"\n📊 Performing emotion analysis every 0.1 seconds (first 15 seconds)...")
-        print(f"Video FPS: {fps:.1f}, Analysis interval: every {analysis_interval} frames")
-        print(f"Expected analysis points: {max_frames // analysis_interval}")
+        # Remote videos are read through a local prefetching range proxy
+        remote_input = None
+        capture_path = video_path
+        if is_remote:
+            from remote_input import PrefetchingVideoInput
+            
+            remote_input = PrefetchingVideoInput(video_path).start()
+            capture_path = remote_input.local_url
+            print(f"🌐 Streaming remote video via {capture_path}")
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # Analyze every 0.1 seconds (every analysis_interval frames)
-            if frame_count % analysis_interval == 0:
-                try:
-                    result = DeepFace.analyze(
-                        img_path=frame, 
-                        actions=['emotion'], 
-                        enforce_detection=False,
-                        silent=True
-                    )
+        try:
+            cap = cv2.VideoCapture(capture_path)
+            frame_count = 0
+            results = FrameResultBuffer()
+            
+            # Get video FPS to calculate accurate timestamps
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            if fps <= 0:
+                fps = 30.0  # Default fallback
+            
+            # Calculate analysis interval: every 0.1 seconds
+            # For 30fps video: analyze every 3 frames (30fps * 0.1s = 3 frames)
+            analysis_interval = max(1, int(fps * 0.1))  # At least every frame
+            
+            # Calculate max frames for 15 seconds
+            max_frames = int(fps * 15)  # 15 seconds of video
+            
+            print(f"\n📊 Performing emotion analysis every 0.1 seconds (first 15 seconds)...")
+            print(f"Video FPS: {fps:.1f}, Analysis interval: every {analysis_interval} frames")
+            print(f"Expected analysis points: {max_frames // analysis_interval}")
+            
+            # Decode sampled frames into reused buffers instead of a new array per frame
+            from frame_pool import FramePool, frame_shape
+            
+            pool = FramePool()
+            shape = frame_shape(cap)
+            
+            while True:
+                # grab() only advances; frames between analysis points are never converted to BGR
+                if not cap.grab():
+                    break
                     
-                    if result:
-                        frame_result = {
-                            "frame_number": frame_count,
-                            "timestamp_seconds": frame_count / fps,  # Use actual FPS
-                            "dominant_emotion": result[0]['dominant_emotion'],
-                            "emotions": {
-                                emotion: float(score) 
-                                for emotion, score in result[0]['emotion'].items()
-                            }
-                        }
-                        results.append(frame_result)
-                        
-                        # Print progress every 30 frames to avoid too much output
-                        if len(results) % 10 == 0:
-                            print(f"Analysis point {len(results):3d} - Frame {frame_count:4d} ({frame_result['timestamp_seconds']:6.1f}s): {result[0]['dominant_emotion']}")
+                # Analyze every 0.1 seconds (every analysis_interval frames)
+                if frame_count % analysis_interval == 0:
+                    ret, frame = pool.retrieve(cap, shape)
+                    try:
+                        if not ret:
+                            raise ValueError("could not decode frame")
+                        frame_result = analyze_frame_emotion(frame, frame_count, fps, emotion_backend, crop_cache)
                         
-                except Exception as e:
-                    if frame_count % (analysis_interval * 10) == 0:  # Only print errors occasionally
-                        print(f"Frame {frame_count} analysis failed: {e}")
+                        if frame_result:
+                            results.append(frame_result)
+                            if first_result_seconds is None:
+                                first_result_seconds = time.monotonic() - analysis_started
+                            
+                            # Print progress every 30 frames to avoid too much output
+                            if len(results) % 10 == 0:
+                                print(f"Analysis point {len(results):3d} - Frame {frame_count:4d} ({frame_result['timestamp_seconds']:6.1f}s): {frame_result['dominant_emotion']}")
+                            
+                    except Exception as e:
+                        if frame_count % (analysis_interval * 10) == 0:  # Only print errors occasionally
+                            print(f"Frame {frame_count} analysis failed: {e}")
+                
+                frame_count += 1
+                
+                # Stop after 15 seconds
+                if frame_count >= max_frames:
+                    print(f"✅ Reached 15 seconds limit, processed {frame_count} frames")
+                    print(f"✅ Total analysis points: {len(results)}")
+                    break
             
-            frame_count += 1
+            cap.release()
             
-            # Stop after 15 seconds
-            if frame_count >= max_frames:
-                print(f"✅ Reached 15 seconds limit, processed {frame_count} frames")
-                print(f"✅ Total analysis points: {len(results)}")
-                break
+            analysis_seconds = time.monotonic() - analysis_started
+            run_info = {
+                "emotion_backend": emotion_backend,
+                "time_to_first_result_seconds": first_result_seconds,
+                "analysis_seconds": analysis_seconds,
+                "analysis_points_per_second": len(results) / analysis_seconds if analysis_seconds > 0 else 0.0
+            }
+            if crop_cache is not None:
+                run_info["crop_cache"] = crop_cache.stats()
+            if remote_input is not None:
+                run_info["remote_input"] = remote_input.stats()
+        finally:
+            # Stop the proxy and drop its chunk cache even if analysis failed
+            if remote_input is not None:
+                remote_input.stop()
         
-        cap.release()
+        save_analysis_results(results, video_path, json_output, csv_output, extra_info=run_info)
         
-        # Save results to JSON
-        with open(json_output, 'w', encoding='utf-8') as f:
-            json.dump({
-                "video_info": {
-                    "file_path": video_path,
-                    "total_frames_analyzed": len(results),
-                    "analysis_date": datetime.now().isoformat()
-                },
-                "results": results
-            }, f, indent=2, ensure_ascii=False)
-        
-        # Save results to CSV
-        if results:
-            df_data = []
-            for result in results:
-                row = {
-                    "frame_number": result["frame_number"],
-                    "timestamp_seconds": result["timestamp_seconds"],
-                    "dominant_emotion": result["dominant_emotion"]
-                }
-                # Add all emotion scores
-                row.update(result["emotions"])
-                df_data.append(row)
-            
-            df = pd.DataFrame(df_data)
-            df.to_csv(csv_output, index=False, encoding='utf-8')
-            
-            print(f"\n✅ Results saved:")
-            print(f"   📄 JSON: {json_output}")
-            print(f"   📊 CSV:  {csv_output}")
-            print(f"   📈 Analyzed {len(results)} time points")
+        if crop_cache is not None:
+            cache_stats = run_info["crop_cache"]
+            print(f"   🗃️  Crop cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                  f"({cache_stats['hit_rate'] * 100:.1f}% hit rate)")
         
+    if not generate_video:
+        if is_remote:
+            print(f"\n⏭️  Skipped video generation for remote input (pass generate_video=True "
+                  f"or use render_video.py on the saved results)")
+        print(f"\n🎯 All output files should be in: {os.path.abspath(output_dir)}")
+        return
+    
     # Method 2: Use stream function to generate video with analysis results
     print(f"\n🎥 Generating video with analysis results...")
     print(f"Output video: {video_output}")
     
+    # Remote videos go through the prefetching proxy here too, not straight to DeepFace.stream
+    remote_input = None
+    stream_source = video_path
+    
     try:
+        from deepface import DeepFace
+        
+        if is_remote:
+            from remote_input import PrefetchingVideoInput
+            
+            remote_input = PrefetchingVideoInput(video_path).start()
+            stream_source = remote_input.local_url
+        
         # Create database directory
         db_path = "./temp_database"
         os.makedirs(db_path, exist_ok=True)
@@ -214,7 +447,7 @@ def analyze_video_with_output(video_path=None):
         # Use stream function, specify output path this time
         DeepFace.stream(
             db_path=db_path,
-            source=video_path,
+            source=stream_source,
             enable_face_analysis=True,
             time_threshold=2,
             frame_threshold=3,
@@ -225,6 +458,9 @@ def analyze_video_with_output(video_path=None):
         print("\n⏹️  User stopped video generation")
     except Exception as e:
         print(f"❌ Video generation error: {e}")
+    finally:
+        if remote_input is not None:
+            remote_input.stop()
     
     print(f"\n🎯 All output files should be in: {os.path.abspath(output_dir)}")
 
@@ -265,30 +501,35 @@ def show_analysis_summary(video_name=None):
         json_path = os.path.join(main_output_dir, video_name, f"emotion_analysis_{video_name}.json")
     
     if os.path.exists(json_path):
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        from results_store import load_result_rows, load_video_info
+        import numpy as np
         
-        results = data['results']
-        if results:
+        rows = load_result_rows(json_path)
+        if len(rows):
             print(f"\n📈 Emotion Analysis Summary - {os.path.basename(json_path)}:")
             print("-" * 60)
             
             # Count main emotions
-            emotion_counts = {}
-            for result in results:
-                emotion = result['dominant_emotion']
-                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
+            emotion_counts = np.bincount(rows['dominant'], minlength=len(EMOTION_LABELS))
             
             # Sort by occurrence count
-            sorted_emotions = sorted(emotion_counts.items(), key=lambda x: x[1], reverse=True)
+            order = np.argsort(-emotion_counts, kind='stable')
             
-            total_points = len(results)
-            for emotion, count in sorted_emotions:
+            total_points = len(rows)
+            for code in order:
+                count = int(emotion_counts[code])
+                if count == 0:
+                    break
                 percentage = (count / total_points) * 100
-                print(f"  {emotion:8s}: {count:3d} times ({percentage:5.1f}%)")
+                print(f"  {EMOTION_LABELS[code]:8s}: {count:3d} times ({percentage:5.1f}%)")
             
             print(f"\nTotal analysis points: {total_points}")
-            print(f"Video duration: {results[-1]['timestamp_seconds']:.1f} seconds")
+            print(f"Video duration: {rows['timestamp'][-1]:.1f} seconds")
+            
+            cache_stats = load_video_info(json_path).get('crop_cache')
+            if cache_stats:
+                print(f"Crop cache hit rate: {cache_stats['hit_rate'] * 100:.1f}% "
+                      f"(tolerance {cache_stats['max_distance']} bits)")
             print(f"📁 Results directory: {os.path.dirname(json_path)}")
     else:
         print(f"❌ Analysis results file does not exist: {json_path}")
@@ -320,66 +561,42 @@ def show_all_results_overview():
         json_files = [f for f in files if f.endswith('.json')]
         csv_files = [f for f in files if f.endswith('.csv')]
         mp4_files = [f for f in files if f.endswith('.mp4')]
+        bin_files = [f for f in files if f.endswith('.bin')]
         
         print(f"{i}. 📂 {video_dir}/")
         print(f"   📄 JSON: {len(json_files)} files")
         print(f"   📊 CSV:  {len(csv_files)} files") 
+        print(f"   📦 BIN:  {len(bin_files)} files")
         print(f"   🎥 MP4:  {len(mp4_files)} files")
         
         # If there are JSON files, show brief analysis results
-        if json_files:
+        analysis_files = [f for f in json_files if f.startswith('emotion_analysis_')] or json_files
+        if analysis_files:
             try:
-                json_path = os.path.join(dir_path, json_files[0])
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                from results_store import load_result_rows
+                import numpy as np
                 
-                results = data['results']
-                if results:
+                json_path = os.path.join(dir_path, analysis_files[0])
+                rows = load_result_rows(json_path)
+                
+                if len(rows):
                     # Find main emotion
-                    emotion_counts = {}
-                    for result in results:
-                        emotion = result['dominant_emotion']
-                        emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-                    
-                    top_emotion = max(emotion_counts.items(), key=lambda x: x[1])
-                    duration = results[-1]['timestamp_seconds']
+                    emotion_counts = np.bincount(rows['dominant'], minlength=len(EMOTION_LABELS))
+                    top_code = int(np.argmax(emotion_counts))
+                    duration = rows['timestamp'][-1]
                     
-                    print(f"   🎯 Main emotion: {top_emotion[0]} ({(top_emotion[1]/len(results)*100):.1f}%)")
+                    print(f"   🎯 Main emotion: {EMOTION_LABELS[top_code]} ({(emotion_counts[top_code]/len(rows)*100):.1f}%)")
                     print(f"   ⏱️  Video duration: {duration:.1f}s")
             except:
                 print(f"   ⚠️  Unable to read analysis results")
         
         print()
 
-def generate_emotion_video(input_video_path, output_video_path, emotion_results):
-    """
-    Generate high-quality playable MP4 video with emotion analysis overlay
-    """
-    print("🎬 Creating high-quality playable MP4 video with emotion overlay...")
-    
-    # Open input video
-    cap = cv2.VideoCapture(input_video_path)
-    if not cap.isOpened():
-        print("❌ Cannot open input video")
-        return None
-    
-    # Get video properties
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if fps <= 0:
-        fps = 30.0
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    
-    print(f"📊 Input video: {width}x{height} @ {fps:.1f}fps, {total_frames} frames")
-    
-    # Ensure output path has .mp4 extension
-    if not output_video_path.lower().endswith('.mp4'):
-        base_name = os.path.splitext(output_video_path)[0]
-        output_video_path = base_name + '.mp4'
+def video_writer_configs(fps, width, height):
+    """Codec configurations to try, most compatible first"""
     
     # Try different codec configurations for maximum compatibility
-    codec_configs = [
+    return [
         # Configuration 1: Standard MP4V with specific settings
         {
             'fourcc': cv2.VideoWriter_fourcc(*'mp4v'),
@@ -409,6 +626,16 @@ def generate_emotion_video(input_video_path, output_video_path, emotion_results)
             'description': 'XVID codec'
         }
     ]
+
+def open_video_writer(output_video_path, fps, width, height, writer_config=None):
+    """
+    Open a VideoWriter, returning (writer, used_config) or (None, None)
+    
+    With writer_config only that configuration is tried, so every segment of a
+    parallel render is written with the same codec, frame rate and size.
+    """
+    
+    codec_configs = [writer_config] if writer_config else video_writer_configs(fps, width, height)
     
     out = None
     used_config = None
@@ -425,29 +652,10 @@ def generate_emotion_video(input_video_path, output_video_path, emotion_results)
             )
             
             if out.isOpened():
-                # Test write a frame to make sure it really works
-                test_frame = cv2.imread(input_video_path) if os.path.exists(input_video_path + '.jpg') else None
-                if test_frame is None:
-                    # Create a test frame
-                    test_frame = cv2.resize(cv2.imread('temp_frame.jpg', cv2.IMREAD_COLOR) if os.path.exists('temp_frame.jpg') else 
-                                          (cv2.cvtColor(cv2.imread(input_video_path) if os.path.exists(input_video_path + '.frame') else 
-                                                       255 * cv2.ones((config['size'][1], config['size'][0], 3), dtype=cv2.uint8), cv2.COLOR_BGR2RGB)), config['size'])
-                
-                if test_frame is None:
-                    # Create a simple test frame
-                    test_frame = 255 * cv2.ones((config['size'][1], config['size'][0], 3), dtype=cv2.uint8)
-                else:
-                    test_frame = cv2.resize(test_frame, config['size'])
-                
-                try:
-                    out.write(test_frame)
-                    used_config = config
-                    print(f"✅ Successfully initialized with: {config['description']}")
-                    break
-                except:
-                    out.release()
-                    out = None
-                    print(f"❌ Test write failed for: {config['description']}")
+                # No test frame is written: it would become the first frame of the output
+                used_config = config
+                print(f"✅ Successfully initialized with: {config['description']}")
+                break
             else:
                 if out:
                     out.release()
@@ -460,36 +668,82 @@ def generate_emotion_video(input_video_path, output_video_path, emotion_results)
                 out = None
             print(f"❌ Error with {config['description']}: {e}")
     
+    return out, used_config
+
+def generate_emotion_video(input_video_path, output_video_path, emotion_results, start_frame=0, end_frame=None,
+                           writer_config=None):
+    """
+    Generate high-quality playable MP4 video with emotion analysis overlay
+    
+    Renders frames [start_frame, end_frame); end_frame=None renders 15 seconds.
+    writer_config (from open_video_writer) skips the codec fallback search.
+    """
+    print("🎬 Creating high-quality playable MP4 video with emotion overlay...")
+    
+    # Open input video
+    cap = cv2.VideoCapture(input_video_path)
+    if not cap.isOpened():
+        print("❌ Cannot open input video")
+        return None
+    
+    # Get video properties
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0:
+        fps = 30.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    
+    print(f"📊 Input video: {width}x{height} @ {fps:.1f}fps, {total_frames} frames")
+    
+    # Ensure output path has .mp4 extension
+    if not output_video_path.lower().endswith('.mp4'):
+        base_name = os.path.splitext(output_video_path)[0]
+        output_video_path = base_name + '.mp4'
+    
+    out, used_config = open_video_writer(output_video_path, fps, width, height, writer_config)
+    
     if out is None or used_config is None:
         print("❌ Failed to initialize video writer with any configuration")
         cap.release()
         return None
     
-    # Now process the actual video
-    frame_count = 0
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Reset to beginning
+    # Now process the actual video from start_frame
+    from chunked_analysis import seek_to_frame
+    
+    frame_count = start_frame
+    cap = seek_to_frame(cap, input_video_path, start_frame)
     
     # Create emotion results lookup for faster access
     emotion_lookup = {}
     for result in emotion_results:
         emotion_lookup[result['frame_number']] = result
     
-    # Calculate how many frames to process (15 seconds)
-    max_frames_to_process = int(used_config['fps'] * 15)
-    frames_to_process = min(total_frames, max_frames_to_process)
+    # Calculate how many frames to process (15 seconds unless end_frame is given)
+    if end_frame is None:
+        end_frame = start_frame + int(used_config['fps'] * 15)
+    if total_frames > 0:
+        end_frame = min(total_frames, end_frame)
+    frames_to_process = max(0, end_frame - start_frame)
     
     print(f"Processing {frames_to_process} frames at {used_config['fps']:.1f}fps...")
     
     frames_written = 0
     
-    while frame_count < frames_to_process:
-        ret, frame = cap.read()
+    # Decode and resize into reused buffers
+    from frame_pool import FramePool, frame_shape
+    
+    pool = FramePool()
+    shape = frame_shape(cap)
+    
+    while frame_count < start_frame + frames_to_process:
+        ret, frame = pool.read(cap, shape)
         if not ret:
             break
         
         # Resize frame to match output configuration
         if frame.shape[:2] != (used_config['size'][1], used_config['size'][0]):
-            frame = cv2.resize(frame, used_config['size'])
+            frame = pool.resize(frame, used_config['size'])
         
         # Add emotion overlay if we have analysis for this frame
         if frame_count in emotion_lookup:
@@ -497,8 +751,8 @@ def generate_emotion_video(input_video_path, output_video_path, emotion_results)
             emotion = result['dominant_emotion']
             timestamp = result['timestamp_seconds']
             
-            # Create overlay with better contrast and readability
-            overlay_frame = frame.copy()
+            # Draw straight onto the pooled frame; it is written out right after
+            overlay_frame = frame
             
             # Main emotion text
             main_text = f"Emotion: {emotion.upper()}"
@@ -518,10 +772,10 @@ def generate_emotion_video(input_video_path, output_video_path, emotion_results)
             bg_width = max(main_size[0], time_size[0]) + 2 * padding
             bg_height = main_size[1] + time_size[1] + 4 * padding
             
-            # Draw semi-transparent background
-            overlay = overlay_frame.copy()
-            cv2.rectangle(overlay, (10, 10), (10 + bg_width, 10 + bg_height), (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.8, overlay_frame, 0.2, 0, overlay_frame)
+            # Draw semi-transparent background: blending a black box at 0.8 only
+            # darkens the box itself, so scale that region in place (no frame copies)
+            box = overlay_frame[10:11 + bg_height, 10:11 + bg_width]
+            cv2.addWeighted(box, 0.2, box, 0, 0, box)
             
             # Add white border for better visibility
             cv2.rectangle(overlay_frame, (8, 8), (12 + bg_width, 12 + bg_height), (255, 255, 255), 2)
@@ -547,9 +801,9 @@ def generate_emotion_video(input_video_path, output_video_path, emotion_results)
         frame_count += 1
         
         # Show progress every 30 frames
-        if frame_count % 30 == 0:
-            progress = (frame_count / frames_to_process) * 100
-            print(f"Video progress: {progress:.1f}% ({frame_count}/{frames_to_process}) - {frames_written} frames written")
+        if frames_written % 30 == 0:
+            progress = (frames_written / frames_to_process) * 100
+            print(f"Video progress: {progress:.1f}% ({frames_written}/{frames_to_process}) - {frames_written} frames written")
     
     # Release everything
     cap.release()
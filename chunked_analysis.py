@@ -0,0 +1,245 @@
+"""
+Chunked parallel analysis of a single long video.
+
+The video's frame range is split into contiguous segments; each segment is
+analyzed in its own worker process that seeks straight to its first frame.
+Sample points stay on the global 0.1 second grid (frame_number divisible by
+the analysis interval), and because segments partition the frame range every
+sample point belongs to exactly one segment - no duplicates, no gaps. The
+partial results are merged into one emotion_analysis_<name>.json/.csv.
+"""
+
+import cv2
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from analyze_with_output import analyze_frame_emotion, get_output_paths, save_analysis_results
+from results_store import FrameResultBuffer
+from frame_pool import FramePool, frame_shape
+
+# Each worker loads its own model, so a few workers already fill the machine
+DEFAULT_MAX_WORKERS = 4
+
+
+def get_video_properties(video_path):
+    """Return (fps, total_frames) for a video file"""
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None, 0
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0:
+        fps = 30.0  # Default fallback
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, total_frames
+
+
+def split_segments(total_frames, num_segments):
+    """Split [0, total_frames) into contiguous (start, end) frame ranges"""
+
+    num_segments = max(1, min(num_segments, total_frames))
+    bounds = [round(i * total_frames / num_segments) for i in range(num_segments + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(num_segments) if bounds[i] < bounds[i + 1]]
+
+
+def seek_to_frame(cap, video_path, start_frame):
+    """
+    Position cap so the next read() returns start_frame. Seeking is not frame
+    accurate for every codec, so verify and fall back to grabbing forward.
+    """
+
+    if start_frame == 0:
+        return cap
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+    if position > start_frame:
+        # Overshot: restart from the beginning and walk forward
+        cap.release()
+        cap = cv2.VideoCapture(video_path)
+        position = 0
+
+    while position < start_frame:
+        if not cap.grab():
+            break
+        position += 1
+
+    return cap
+
+
+def limit_worker_threads(threads, emotion_backend="tensorflow"):
+    """
+    Pool initializer: give each worker process an equal share of the cores so
+    num_workers models do not each start a cpu_count-sized thread pool
+    """
+
+    for variable in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[variable] = str(threads)
+    cv2.setNumThreads(threads)
+
+    if emotion_backend == "tensorflow":
+        try:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(threads)
+        except (ImportError, RuntimeError):
+            pass  # No TensorFlow, or its runtime is already initialized
+    else:
+        import onnx_emotion
+        onnx_emotion.SESSION_THREADS = threads
+
+
+def analyze_segment(video_path, start_frame, end_frame, fps, analysis_interval,
+                    emotion_backend="tensorflow", crop_cache_distance=None):
+    """Worker: analyze sample points in [start_frame, end_frame) of one video"""
+
+    crop_cache = None
+    if crop_cache_distance is not None:
+        from face_cache import PerceptualHashCache
+        crop_cache = PerceptualHashCache(max_distance=crop_cache_distance)
+
+    cap = seek_to_frame(cv2.VideoCapture(video_path), video_path, start_frame)
+    results = FrameResultBuffer()
+    pool = FramePool()
+    shape = frame_shape(cap)
+    failures = 0
+    started = time.monotonic()
+
+    frame_count = start_frame
+    while frame_count < end_frame:
+        # Only decode frames on the global sampling grid; grab() the rest
+        if frame_count % analysis_interval != 0:
+            if not cap.grab():
+                break
+            frame_count += 1
+            continue
+
+        ret, frame = pool.read(cap, shape)
+        if not ret:
+            break
+
+        try:
+            frame_result = analyze_frame_emotion(frame, frame_count, fps, emotion_backend, crop_cache)
+            if frame_result:
+                results.append(frame_result)
+        except Exception:
+            failures += 1
+
+        frame_count += 1
+
+    cap.release()
+
+    return {
+        "start_frame": start_frame,
+        "end_frame": end_frame,
+        "frames_covered": frame_count - start_frame,
+        "results": results.array,  # Compact structured array pickles cheaply back to the parent
+        "failures": failures,
+        "elapsed_seconds": time.monotonic() - started
+    }
+
+
+def analyze_video_chunked(video_path, num_workers=None, num_segments=None, max_seconds=None,
+                          emotion_backend="tensorflow", crop_cache_distance=None):
+    """
+    Analyze one video in parallel time segments and merge into the standard output files
+
+    max_seconds limits analysis to the start of the video (None = whole video).
+    """
+
+    fps, total_frames = get_video_properties(video_path)
+    if fps is None:
+        print(f"❌ Cannot open video: {video_path}")
+        return None
+
+    if max_seconds is not None:
+        total_frames = min(total_frames, int(fps * max_seconds))
+
+    cpu_count = os.cpu_count() or 1
+    num_workers = num_workers or min(DEFAULT_MAX_WORKERS, cpu_count)
+    threads_per_worker = max(1, cpu_count // num_workers)
+    num_segments = num_segments or num_workers
+    analysis_interval = max(1, int(fps * 0.1))
+    segments = split_segments(total_frames, num_segments)
+
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    output_dir, json_output, csv_output = get_output_paths(video_name)
+
+    print("=== Starting chunked parallel emotion analysis ===")
+    print(f"Input video: {video_path}")
+    print(f"Output directory: {output_dir}")
+    print(f"Video FPS: {fps:.1f}, {total_frames} frames, analysis interval: every {analysis_interval} frames")
+    print(f"Segments: {len(segments)}, workers: {num_workers} ({threads_per_worker} threads each)")
+    if crop_cache_distance is not None:
+        print(f"Crop cache: perceptual hash tolerance {crop_cache_distance} bits")
+
+    started = time.monotonic()
+    segment_outputs = []
+
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=limit_worker_threads,
+                             initargs=(threads_per_worker, emotion_backend)) as executor:
+        futures = [
+            executor.submit(analyze_segment, video_path, start, end, fps, analysis_interval,
+                            emotion_backend, crop_cache_distance)
+            for start, end in segments
+        ]
+        for future in futures:
+            output = future.result()
+            segment_outputs.append(output)
+            print(f"✅ Segment frames {output['start_frame']:6d}-{output['end_frame']:6d}: "
+                  f"{len(output['results'])} points in {output['elapsed_seconds']:.1f}s")
+
+    # Merge in global frame order
+    results = FrameResultBuffer(sum(len(output["results"]) for output in segment_outputs))
+    for output in segment_outputs:
+        results.extend(output["results"])
+    results.sort()
+
+    elapsed = time.monotonic() - started
+    incomplete = [o for o in segment_outputs if o["frames_covered"] < o["end_frame"] - o["start_frame"]]
+    if incomplete:
+        print(f"⚠️  {len(incomplete)} segment(s) ended early (video shorter than reported frame count)")
+
+    save_analysis_results(results, video_path, json_output, csv_output, extra_info={
+        "mode": "chunked",
+        "emotion_backend": emotion_backend,
+        "workers": num_workers,
+        "threads_per_worker": threads_per_worker,
+        "crop_cache_distance": crop_cache_distance,
+        "segments": [
+            {"start_frame": o["start_frame"], "end_frame": o["end_frame"],
+             "points": len(o["results"]), "failures": o["failures"]}
+            for o in segment_outputs
+        ],
+        "elapsed_seconds": elapsed
+    })
+
+    print(f"⏱️  Chunked analysis finished in {elapsed:.1f}s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze one long video in parallel segments")
+    parser.add_argument("video", help="Video file to analyze")
+    parser.add_argument("--workers", type=int,
+                        help=f"Worker processes (default: CPU count, at most {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--segments", type=int, help="Number of segments (default: one per worker)")
+    parser.add_argument("--max-seconds", type=float, help="Only analyze the first N seconds")
+    parser.add_argument("--backend", default="tensorflow", help="tensorflow, onnx or onnx-int8")
+    parser.add_argument("--crop-cache-distance", type=int,
+                        help="Reuse emotion scores for face crops within this many dHash bits (default: off)")
+    args = parser.parse_args()
+
+    analyze_video_chunked(
+        args.video,
+        num_workers=args.workers,
+        num_segments=args.segments,
+        max_seconds=args.max_seconds,
+        emotion_backend=args.backend,
+        crop_cache_distance=args.crop_cache_distance
+    )
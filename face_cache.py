@@ -0,0 +1,138 @@
+"""
+Perceptual-hash LRU cache in front of the emotion classifier.
+
+At 0.1 second sampling consecutive face crops of a still speaker are almost
+identical. Each aligned crop is reduced to a 64-bit difference hash (dHash);
+if a cached crop lies within max_distance bits (Hamming distance), its
+emotion scores are reused instead of running the classifier again.
+"""
+
+import cv2
+import threading
+import numpy as np
+from collections import OrderedDict
+
+
+def dhash(face_gray, hash_size=8):
+    """64-bit difference hash of a grayscale face crop"""
+
+    resized = cv2.resize(face_gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = resized[:, 1:] > resized[:, :-1]
+
+    value = 0
+    for bit in diff.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class PerceptualHashCache:
+    """LRU cache of emotion scores keyed by perceptual hash with a Hamming tolerance"""
+
+    def __init__(self, capacity=256, max_distance=4):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.entries = OrderedDict()  # hash -> emotion scores
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, face_hash):
+        """Return cached emotion scores for a near-identical crop, or None"""
+
+        with self.lock:
+            key = face_hash if face_hash in self.entries else None
+
+            if key is None and self.max_distance > 0:
+                # Most recent entries first: the previous crop is the likeliest match
+                for cached_hash in reversed(self.entries):
+                    if hamming_distance(face_hash, cached_hash) <= self.max_distance:
+                        key = cached_hash
+                        break
+
+            if key is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+    def put(self, face_hash, emotions):
+        with self.lock:
+            self.entries[face_hash] = emotions
+            self.entries.move_to_end(face_hash)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "capacity": self.capacity,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+def _dominant(emotions):
+    return {
+        "dominant_emotion": max(emotions, key=emotions.get),
+        "emotion": emotions
+    }
+
+
+def classify_with_cache(frame, emotion_backend, cache):
+    """
+    Detect and align the face, then classify it unless a near-identical crop is
+    cached. Returns the same shape as DeepFace.analyze(...)[0] for emotions.
+    """
+
+    if emotion_backend == "tensorflow":
+        from deepface import DeepFace
+
+        faces = DeepFace.extract_faces(
+            img_path=frame,
+            detector_backend='opencv',
+            enforce_detection=False,
+            align=True
+        )
+        if not faces:
+            return None
+
+        # extract_faces returns RGB floats in [0, 1]
+        face_bgr = (faces[0]['face'] * 255).astype(np.uint8)[:, :, ::-1]
+        face_gray = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2GRAY)
+
+        face_hash = dhash(face_gray)
+        emotions = cache.get(face_hash)
+        if emotions is None:
+            # The crop is already detected and aligned, so skip detection this time
+            result = DeepFace.analyze(
+                img_path=np.ascontiguousarray(face_bgr),
+                actions=['emotion'],
+                detector_backend='skip',
+                enforce_detection=False,
+                silent=True
+            )
+            if not result:
+                return None
+            emotions = {emotion: float(score) for emotion, score in result[0]['emotion'].items()}
+            cache.put(face_hash, emotions)
+    else:
+        from onnx_emotion import get_onnx_classifier
+
+        classifier = get_onnx_classifier(emotion_backend)
+        face_gray = classifier.detect_face(frame)
+
+        face_hash = dhash(face_gray)
+        emotions = cache.get(face_hash)
+        if emotions is None:
+            emotions = classifier.predict_scores(face_gray)
+            cache.put(face_hash, emotions)
+
+    return _dominant(emotions)
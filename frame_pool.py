@@ -0,0 +1,267 @@
+"""
+Preallocated frame buffers to avoid a fresh allocation per decoded frame.
+
+cap.read() allocates a new BGR array every call unless it is given one to
+decode into. FramePool hands out a small ring of preallocated arrays that
+decoding (cap.read(image=buf) / cap.retrieve(image=buf)) and resizing
+(cv2.resize(..., dst=buf)) write into, and counts how often OpenCV still had
+to allocate because a buffer did not fit.
+"""
+
+import cv2
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import multiprocessing
+import numpy as np
+
+
+class FramePool:
+    """Ring of preallocated frame arrays with allocation counters"""
+
+    def __init__(self, size=2):
+        self.size = size
+        self.buffers = {}  # shape -> list of arrays
+        self.next_index = {}
+        self.allocations = 0  # Arrays this pool created
+        self.fallback_allocations = 0  # Frames OpenCV could not write into a pooled array
+        self.reuses = 0
+
+    def acquire(self, shape):
+        """Next pooled array for this (height, width, channels) shape"""
+
+        shape = tuple(shape)
+        if shape not in self.buffers:
+            self.buffers[shape] = [np.empty(shape, dtype=np.uint8) for _ in range(self.size)]
+            self.next_index[shape] = 0
+            self.allocations += self.size
+
+        index = self.next_index[shape]
+        self.next_index[shape] = (index + 1) % self.size
+        return self.buffers[shape][index]
+
+    def _track(self, result, buf):
+        if result is not None and result is not buf and not np.shares_memory(result, buf):
+            self.fallback_allocations += 1
+        else:
+            self.reuses += 1
+
+    def read(self, cap, shape):
+        """cap.read() into a pooled array"""
+
+        buf = self.acquire(shape)
+        ret, frame = cap.read(image=buf)
+        if ret:
+            self._track(frame, buf)
+        return ret, frame
+
+    def retrieve(self, cap, shape):
+        """cap.retrieve() (after grab()) into a pooled array"""
+
+        buf = self.acquire(shape)
+        ret, frame = cap.retrieve(image=buf)
+        if ret:
+            self._track(frame, buf)
+        return ret, frame
+
+    def resize(self, frame, size):
+        """cv2.resize into a pooled (height, width) destination"""
+
+        width, height = size
+        buf = self.acquire((height, width, frame.shape[2]))
+        resized = cv2.resize(frame, (width, height), dst=buf)
+        self._track(resized, buf)
+        return resized
+
+    def stats(self):
+        return {
+            "pool_allocations": self.allocations,
+            "fallback_allocations": self.fallback_allocations,
+            "buffer_reuses": self.reuses
+        }
+
+
+def frame_shape(cap):
+    """(height, width, 3) of the frames a capture will decode"""
+
+    return (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)"""
+
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def _allocated(result, *existing):
+    """True if OpenCV returned a fresh array rather than writing into one of existing"""
+
+    return not any(array is not None and np.shares_memory(result, array) for array in existing)
+
+
+def _darken_box(frame, copy_frame):
+    """generate_emotion_video's overlay background: the old two-copy blend, or in place"""
+
+    if copy_frame:
+        overlay_frame = frame.copy()
+        overlay = overlay_frame.copy()
+        cv2.rectangle(overlay, (10, 10), (210, 90), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.8, overlay_frame, 0.2, 0, overlay_frame)
+        return overlay_frame, 2
+
+    box = frame[10:91, 10:211]
+    cv2.addWeighted(box, 0.2, box, 0, 0, box)
+    return frame, 0
+
+
+def _render_loop(cap, shape, size, analysis_interval, max_frames, pool):
+    """Render path: decode every frame, resize to the writer size, overlay sample points"""
+
+    allocations = 0
+    frames = 0
+    while frames < max_frames:
+        if pool is not None:
+            ret, frame = pool.read(cap, shape)
+        else:
+            ret, frame = cap.read()
+            allocations += ret
+        if not ret:
+            break
+
+        if frame.shape[:2] != (size[1], size[0]):
+            if pool is not None:
+                frame = pool.resize(frame, size)
+            else:
+                resized = cv2.resize(frame, size)
+                allocations += _allocated(resized, frame)
+                frame = resized
+
+        if frames % analysis_interval == 0:
+            frame, copies = _darken_box(frame, copy_frame=pool is None)
+            allocations += copies
+        frames += 1
+
+    return frames, allocations
+
+
+def _analysis_loop(cap, shape, size, analysis_interval, max_frames, pool):
+    """Analysis path: sample every analysis_interval frames for the classifier"""
+
+    allocations = 0
+    frames = 0
+    while frames < max_frames:
+        if pool is not None:
+            # Frames between sample points are only grabbed, never converted to BGR
+            if not cap.grab():
+                break
+            if frames % analysis_interval == 0:
+                ret, frame = pool.retrieve(cap, shape)
+                if not ret:
+                    break
+        else:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            allocations += 1
+        frames += 1
+
+    return frames, allocations
+
+
+BENCHMARK_LOOPS = {
+    "render": _render_loop,
+    "analysis": _analysis_loop,
+}
+
+
+def _benchmark_worker(video_path, loop_name, pooled, max_frames, result_queue):
+    """Benchmark worker: run one loop in one mode under tracemalloc"""
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0:
+        fps = 30.0
+    analysis_interval = max(1, int(fps * 0.1))
+    shape = frame_shape(cap)
+    # The render path writes even dimensions, so odd-sized clips exercise resize too
+    size = (shape[1] - (shape[1] % 2), shape[0] - (shape[0] % 2))
+    pool = FramePool() if pooled else None
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    frames, allocations = BENCHMARK_LOOPS[loop_name](cap, shape, size, analysis_interval, max_frames, pool)
+    elapsed = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cap.release()
+
+    report = {
+        "loop": loop_name,
+        "mode": "pooled" if pooled else "baseline",
+        "frames": frames,
+        "traced_peak_mb": traced_peak / (1024 * 1024),
+        "peak_rss_mb": peak_rss_mb(),
+        "fps": frames / elapsed if elapsed > 0 else 0.0
+    }
+    if pool is not None:
+        report.update(pool.stats())
+        allocations = report["pool_allocations"] + report["fallback_allocations"]
+    report["frame_array_allocations"] = allocations
+    result_queue.put(report)
+
+
+def benchmark_frame_pool(video_path, max_frames=450):
+    """
+    Run the render and analysis loops with per-frame arrays (baseline) and with
+    FramePool, each in a fresh process, and compare frame array allocations,
+    traced peak memory, peak RSS and speed
+    """
+
+    context = multiprocessing.get_context("spawn")  # Fresh interpreter: no inherited RSS
+    reports = []
+    for loop_name in BENCHMARK_LOOPS:
+        for pooled in (False, True):
+            result_queue = context.Queue()
+            process = context.Process(
+                target=_benchmark_worker, args=(video_path, loop_name, pooled, max_frames, result_queue))
+            process.start()
+            reports.append(result_queue.get())
+            process.join()
+
+    print(f"\n🧠 Frame buffer benchmark - {os.path.basename(video_path)}:")
+    print("-" * 70)
+    for report in reports:
+        rss = f"{report['peak_rss_mb']:.1f}MB" if report['peak_rss_mb'] is not None else "n/a"
+        print(f"  {report['loop']:8s} {report['mode']:8s}: {report['frames']} frames, "
+              f"{report['frame_array_allocations']} frame allocations, "
+              f"traced peak {report['traced_peak_mb']:.1f}MB, peak RSS {rss}, {report['fps']:.1f}fps")
+        if report['mode'] == "pooled":
+            print(f"  {'':17s}  pool: {report['pool_allocations']} allocated, "
+                  f"{report['fallback_allocations']} fallbacks, {report['buffer_reuses']} reuses")
+
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs per-frame buffer allocation")
+    parser.add_argument("videos", nargs="+", help="Benchmark clips")
+    parser.add_argument("--max-frames", type=int, default=450, help="Frames to process per clip")
+    args = parser.parse_args()
+
+    for video in args.videos:
+        benchmark_frame_pool(video, max_frames=args.max_frames)
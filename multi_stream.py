@@ -0,0 +1,325 @@
+"""
+Asyncio multi-stream ingestion sharing one inference worker pool.
+
+Every source gets its own reader task that samples a frame every 0.1 seconds
+into a small per-stream queue. A single scheduler takes frames round-robin
+from those queues, forms batches and hands them to one shared thread pool,
+so the emotion model is loaded once no matter how many cameras are attached.
+Results are routed back to per-stream writers under Output_Files/<stream_name>/.
+"""
+
+import cv2
+import os
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from analyze_with_output import analyze_frames_emotion_batch, get_output_paths, save_analysis_results
+from results_store import FrameResultBuffer
+
+
+class StreamState:
+    """Per-stream queue, results and throughput counters"""
+
+    def __init__(self, name, source, queue_size):
+        self.name = name
+        self.source = source
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.results = FrameResultBuffer()
+        self.fps = 30.0
+        self.opened = False
+        self.finished = False
+        self.stop_requested = False  # Set on Ctrl+C: the reader exits after its current frame
+
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self.frames_dropped = 0  # Live sources only: sampled while the queue was full
+        self.frames_analyzed = 0
+        self.analysis_failures = 0
+        self.queue_wait_total = 0.0
+        self.start_time = None
+        self.end_time = None
+
+    def stats(self):
+        elapsed = (self.end_time or time.monotonic()) - (self.start_time or time.monotonic())
+        return {
+            "frames_read": self.frames_read,
+            "frames_sampled": self.frames_sampled,
+            "frames_dropped": self.frames_dropped,
+            "frames_analyzed": self.frames_analyzed,
+            "analysis_failures": self.analysis_failures,
+            "elapsed_seconds": elapsed,
+            "throughput_fps": self.frames_analyzed / elapsed if elapsed > 0 else 0.0,
+            "mean_queue_wait_ms": (self.queue_wait_total / self.frames_analyzed * 1000
+                                   if self.frames_analyzed else 0.0)
+        }
+
+
+LIVE_SCHEMES = ("rtsp://", "rtsps://", "rtmp://", "udp://", "tcp://")
+
+
+def is_live_source(source):
+    """Camera indexes and streaming URLs are live; files (and plain HTTP objects) are not"""
+
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return True
+    return str(source).lower().startswith(LIVE_SCHEMES)
+
+
+def stream_name_for(source):
+    """Default stream name: file name without extension, or camera_<index>"""
+
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return f"camera_{source}"
+    return os.path.splitext(os.path.basename(str(source).rstrip('/')))[0] or "stream"
+
+
+def _next_frame(cap, decode):
+    """grab() the next frame and only decode it (retrieve) at sample points"""
+
+    if not cap.grab():
+        return False, None
+    if not decode:
+        return True, None
+    ret, frame = cap.retrieve()
+    return True, frame if ret else None
+
+
+async def read_stream(state, max_seconds=None):
+    """Read one source without blocking the event loop, queueing a frame every 0.1 seconds"""
+
+    source = int(state.source) if isinstance(state.source, str) and state.source.isdigit() else state.source
+    cap = await asyncio.to_thread(cv2.VideoCapture, source)
+    state.start_time = time.monotonic()
+
+    if not cap.isOpened():
+        print(f"❌ [{state.name}] Cannot open source: {state.source}")
+        state.finished = True
+        return
+    state.opened = True
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0:
+        fps = 30.0  # Default fallback
+    state.fps = fps
+
+    analysis_interval = max(1, int(fps * 0.1))
+    max_frames = int(fps * max_seconds) if max_seconds else None
+    live = is_live_source(state.source)
+
+    print(f"📹 [{state.name}] {fps:.1f}fps, analyzing every {analysis_interval} frames"
+          + (" (live: drop oldest when behind)" if live else ""))
+
+    frame_count = 0
+    try:
+        while (max_frames is None or frame_count < max_frames) and not state.stop_requested:
+            # Sampled frames get a fresh array each: they outlive the next read while queued
+            sample_point = frame_count % analysis_interval == 0
+            grabbed, frame = await asyncio.to_thread(_next_frame, cap, sample_point)
+            if not grabbed:
+                break
+            state.frames_read += 1
+
+            if sample_point and frame is not None:
+                state.frames_sampled += 1
+                item = (frame_count, time.monotonic(), frame)
+                if not live:
+                    # Files can wait: block the reader so no sample point is lost
+                    await state.queue.put(item)
+                    frame_count += 1
+                    continue
+                if state.queue.full():
+                    # Drop the oldest pending frame so this live stream stays current
+                    state.queue.get_nowait()
+                    state.frames_dropped += 1
+                state.queue.put_nowait(item)
+
+            frame_count += 1
+    finally:
+        cap.release()
+        state.finished = True
+
+
+def analyze_batch(batch, emotion_backend="tensorflow"):
+    """
+    Worker side: analyze a batch of (state, frame_number, queued_at, frame).
+    Faces are detected per frame, then classified in one batched model call.
+    """
+
+    started = time.monotonic()
+    outputs = analyze_frames_emotion_batch(
+        [frame for _, _, _, frame in batch],
+        [frame_number for _, frame_number, _, _ in batch],
+        [state.fps for state, _, _, _ in batch],
+        emotion_backend
+    )
+
+    routed = []
+    for (state, _, queued_at, _), output in zip(batch, outputs):
+        if isinstance(output, Exception):
+            routed.append((state, None, started - queued_at, output))
+        else:
+            routed.append((state, output, started - queued_at, None))
+    return routed
+
+
+async def schedule_batches(states, executor, num_workers, batch_size, batch_timeout, emotion_backend):
+    """Take frames round-robin from all streams, form batches and dispatch them to the shared pool"""
+
+    loop = asyncio.get_running_loop()
+    in_flight = set()
+    next_index = 0
+
+    def route(outputs):
+        for state, frame_result, queue_wait, error in outputs:
+            state.queue_wait_total += queue_wait
+            if error is not None:
+                state.analysis_failures += 1
+                if state.analysis_failures % 10 == 1:  # Only print errors occasionally
+                    print(f"[{state.name}] analysis failed: {error}")
+                continue
+            state.frames_analyzed += 1
+            if frame_result:
+                state.results.append(frame_result)
+                if len(state.results) % 10 == 0:
+                    print(f"[{state.name}] Analysis point {len(state.results):3d} - Frame {frame_result['frame_number']:5d} "
+                          f"({frame_result['timestamp_seconds']:6.1f}s): {frame_result['dominant_emotion']}")
+            if state.finished and state.queue.empty() and state.end_time is None:
+                state.end_time = time.monotonic()
+
+    while True:
+        # Round-robin: one frame per stream per pass, starting from a rotating offset
+        batch = []
+        deadline = time.monotonic() + batch_timeout
+        while len(batch) < batch_size:
+            took_any = False
+            for offset in range(len(states)):
+                state = states[(next_index + offset) % len(states)]
+                if not state.queue.empty():
+                    frame_number, queued_at, frame = state.queue.get_nowait()
+                    batch.append((state, frame_number, queued_at, frame))
+                    took_any = True
+                    if len(batch) >= batch_size:
+                        break
+            next_index = (next_index + 1) % len(states)
+
+            if len(batch) >= batch_size or time.monotonic() >= deadline:
+                break
+            if not took_any:
+                if all(s.finished and s.queue.empty() for s in states):
+                    break
+                await asyncio.sleep(0.005)
+
+        if batch:
+            # Bound the number of batches in flight to the pool size
+            while len(in_flight) >= num_workers:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    route(future.result())
+            in_flight.add(loop.run_in_executor(executor, analyze_batch, batch, emotion_backend))
+        elif all(s.finished and s.queue.empty() for s in states):
+            break
+
+    if in_flight:
+        done, _ = await asyncio.wait(in_flight)
+        for future in done:
+            route(future.result())
+
+    for state in states:
+        if state.end_time is None:
+            state.end_time = time.monotonic()
+
+
+async def analyze_streams_async(sources, num_workers=2, batch_size=4, batch_timeout=0.05,
+                                queue_size=8, max_seconds=None, emotion_backend="tensorflow"):
+    """Analyze many sources concurrently and write results per stream"""
+
+    states = []
+    used_names = set()
+    for source in sources:
+        name = stream_name_for(source)
+        # Keep output directories distinct when two sources share a file name
+        unique_name, suffix = name, 2
+        while unique_name in used_names:
+            unique_name = f"{name}_{suffix}"
+            suffix += 1
+        used_names.add(unique_name)
+        states.append(StreamState(unique_name, source, queue_size))
+
+    print(f"=== Starting multi-stream analysis: {len(states)} streams, {num_workers} workers, batch {batch_size} ===")
+
+    try:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            readers = [asyncio.create_task(read_stream(state, max_seconds)) for state in states]
+            scheduler = asyncio.create_task(
+                schedule_batches(states, executor, num_workers, batch_size, batch_timeout, emotion_backend))
+            work = asyncio.gather(*readers, scheduler)
+            try:
+                # Shielded so Ctrl+C does not cancel a reader in the middle of a read
+                await asyncio.shield(work)
+            except (asyncio.CancelledError, KeyboardInterrupt):
+                print("\n⏹️  User stopped multi-stream analysis - finishing queued frames")
+                for state in states:
+                    state.stop_requested = True
+                # Readers exit after their current frame; the scheduler drains queues and in-flight batches
+                await work
+    finally:
+        all_stats = save_stream_results(states)
+
+    print_multi_stream_stats(all_stats)
+    return all_stats
+
+
+def save_stream_results(states):
+    """Write each opened stream's results under Output_Files/<stream_name>/"""
+
+    all_stats = {}
+    for state in states:
+        stats = state.stats()
+        all_stats[state.name] = stats
+        if not state.opened:
+            continue  # Nothing was read: do not leave an empty results file behind
+
+        state.results.sort()
+        _, json_output, csv_output = get_output_paths(state.name)
+        save_analysis_results(state.results, str(state.source), json_output, csv_output,
+                              extra_info={"stream_stats": stats})
+    return all_stats
+
+
+def analyze_streams(sources, **kwargs):
+    """Synchronous entry point for analyze_streams_async"""
+
+    return asyncio.run(analyze_streams_async(sources, **kwargs))
+
+
+def print_multi_stream_stats(all_stats):
+    """Print per-stream throughput stats"""
+
+    print(f"\n📊 Per-stream throughput:")
+    print("-" * 70)
+    for name, stats in all_stats.items():
+        print(f"  {name:20s} analyzed {stats['frames_analyzed']:4d}/{stats['frames_sampled']:4d} sampled, "
+              f"dropped {stats['frames_dropped']:3d}, {stats['throughput_fps']:5.2f} fps, "
+              f"wait {stats['mean_queue_wait_ms']:.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze several video sources with one shared worker pool")
+    parser.add_argument("sources", nargs="+", help="Camera indexes, RTSP/HTTP URLs, or video files")
+    parser.add_argument("--workers", type=int, default=2, help="Shared inference worker threads")
+    parser.add_argument("--batch-size", type=int, default=4, help="Max frames per inference batch")
+    parser.add_argument("--queue-size", type=int, default=8, help="Pending frames kept per stream")
+    parser.add_argument("--max-seconds", type=float, help="Stop each stream after this many seconds of video")
+    parser.add_argument("--backend", default="tensorflow", help="tensorflow, onnx or onnx-int8")
+    args = parser.parse_args()
+
+    analyze_streams(
+        args.sources,
+        num_workers=args.workers,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        max_seconds=args.max_seconds,
+        emotion_backend=args.backend
+    )
@@ -0,0 +1,290 @@
+"""
+ONNX Runtime backend for the emotion classification step.
+
+DeepFace's emotion model is a small Keras CNN (48x48 grayscale input, seven
+softmax outputs). It is exported once to ONNX (optionally int8-quantized) and
+then run through ONNX Runtime, with faces found by OpenCV's Haar cascade, so
+TensorFlow is never imported on the inference path.
+
+The cascade is the one DeepFace's default opencv backend uses, but that
+backend also rotates each face so the eyes are level (align=True); here the
+Haar box is cropped as is. End-to-end results therefore differ from the
+TensorFlow path by alignment as well as by the model. compare_backends feeds
+both models the same DeepFace-aligned crop, so its agreement number measures
+the exported (or int8) model alone.
+
+Optional dependencies: onnxruntime for inference, tensorflow + tf2onnx for
+the one-off export.
+"""
+
+import cv2
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+from analyze_with_output import (EMOTION_LABELS, build_keras_emotion_model, emotion_model_input,
+                                 extract_aligned_face_gray, get_output_paths)
+
+MODEL_DIR = "models"
+ONNX_MODEL_PATH = os.path.join(MODEL_DIR, "emotion.onnx")
+ONNX_INT8_MODEL_PATH = os.path.join(MODEL_DIR, "emotion_int8.onnx")
+
+# Backend name -> model file
+ONNX_BACKENDS = {
+    "onnx": ONNX_MODEL_PATH,
+    "onnx-int8": ONNX_INT8_MODEL_PATH,
+}
+
+_classifiers = {}
+
+# Intra-op threads per session (None = ONNX Runtime default); worker pools lower it
+SESSION_THREADS = None
+
+
+def _require_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError:
+        raise ImportError("ONNX emotion backend requires onnxruntime: pip install onnxruntime")
+    return onnxruntime
+
+
+def export_emotion_model_to_onnx(output_path=ONNX_MODEL_PATH):
+    """Export DeepFace's Keras emotion model to ONNX (needs tensorflow and tf2onnx)"""
+
+    try:
+        import tensorflow as tf
+        import tf2onnx
+    except ImportError:
+        raise ImportError("Exporting the emotion model requires tensorflow and tf2onnx: pip install tf2onnx")
+
+    keras_model = build_keras_emotion_model()
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    input_signature = [tf.TensorSpec((None, 48, 48, 1), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(keras_model, input_signature=input_signature, output_path=output_path)
+
+    print(f"✅ Exported emotion model: {output_path}")
+    return output_path
+
+
+def quantize_emotion_model(input_path=ONNX_MODEL_PATH, output_path=ONNX_INT8_MODEL_PATH):
+    """Create an int8 dynamically-quantized copy of the ONNX emotion model"""
+
+    _require_onnxruntime()
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(input_path, output_path, weight_type=QuantType.QInt8)
+
+    size_before = os.path.getsize(input_path) / (1024 * 1024)
+    size_after = os.path.getsize(output_path) / (1024 * 1024)
+    print(f"✅ Quantized emotion model: {output_path} ({size_before:.1f}MB -> {size_after:.1f}MB)")
+    return output_path
+
+
+class OnnxEmotionClassifier:
+    """Haar-cascade face detection plus ONNX Runtime emotion classification"""
+
+    def __init__(self, model_path):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX emotion model not found: {model_path} "
+                                    f"(run: python onnx_emotion.py export)")
+
+        onnxruntime = _require_onnxruntime()
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if SESSION_THREADS:
+            options.intra_op_num_threads = SESSION_THREADS
+            options.inter_op_num_threads = 1
+
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.face_detector = cv2.CascadeClassifier(
+            os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+
+    def detect_face(self, frame):
+        """
+        Return the largest face crop, or the whole frame when no face is found.
+        Unlike DeepFace's opencv backend the crop is not eye-aligned.
+        """
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = self.face_detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=10)
+
+        # Mirror enforce_detection=False: fall back to the whole image
+        if len(faces) == 0:
+            return gray
+
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        return gray[y:y + h, x:x + w]
+
+    def predict_batch(self, faces):
+        """Raw model outputs for an (N, 48, 48, 1) float32 batch, in one session.run"""
+
+        return self.session.run(None, {self.input_name: faces.astype(np.float32, copy=False)})[0]
+
+    def predict_scores(self, face_gray):
+        """Emotion percentages for one grayscale face crop"""
+
+        face = emotion_model_input(face_gray).reshape(1, 48, 48, 1)
+
+        predictions = self.predict_batch(face)[0]
+        predictions = predictions / predictions.sum()
+        return {label: float(100 * score) for label, score in zip(EMOTION_LABELS, predictions)}
+
+    def analyze(self, frame):
+        """Same shape as DeepFace.analyze(...)[0] for the emotion action"""
+
+        emotions = self.predict_scores(self.detect_face(frame))
+        return {
+            "dominant_emotion": max(emotions, key=emotions.get),
+            "emotion": emotions
+        }
+
+
+def get_onnx_classifier(backend="onnx"):
+    """Load (once) the classifier for an ONNX backend name"""
+
+    if backend not in ONNX_BACKENDS:
+        raise ValueError(f"Unknown ONNX backend: {backend} (choose from {', '.join(ONNX_BACKENDS)})")
+
+    if backend not in _classifiers:
+        _classifiers[backend] = OnnxEmotionClassifier(ONNX_BACKENDS[backend])
+    return _classifiers[backend]
+
+
+def compare_backends(video_path, backend="onnx", max_points=100):
+    """
+    Run the Keras and ONNX emotion models on the same sampled face crops and
+    report how often they agree, plus per-call classifier latency for each.
+
+    Both models get the DeepFace-aligned crop, so detection and alignment
+    differences (see the module docstring) are kept out of the agreement number.
+    """
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"❌ Cannot open video: {video_path}")
+        return None
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0:
+        fps = 30.0  # Default fallback
+    analysis_interval = max(1, int(fps * 0.1))
+
+    keras_model = build_keras_emotion_model()
+    classifier = get_onnx_classifier(backend)
+
+    def percentages(predictions):
+        return {label: float(100 * score) for label, score in zip(EMOTION_LABELS, predictions / predictions.sum())}
+
+    # Time the first call separately - it includes graph warm-up
+    startup = {}
+    tf_times = []
+    onnx_times = []
+    agreements = 0
+    score_diffs = []
+    compared = 0
+    frame_count = 0
+
+    print(f"🔬 Comparing tensorflow vs {backend} on {os.path.basename(video_path)} (up to {max_points} points)")
+
+    while compared < max_points:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        if frame_count % analysis_interval == 0:
+            try:
+                face = emotion_model_input(extract_aligned_face_gray(frame))[np.newaxis, :, :, np.newaxis]
+
+                start = time.perf_counter()
+                tf_scores = percentages(keras_model.predict(face, verbose=0)[0])
+                tf_elapsed = time.perf_counter() - start
+
+                start = time.perf_counter()
+                onnx_scores = percentages(classifier.predict_batch(face)[0])
+                onnx_elapsed = time.perf_counter() - start
+            except Exception as e:
+                print(f"Frame {frame_count} comparison failed: {e}")
+                frame_count += 1
+                continue
+
+            if "tensorflow" not in startup:
+                startup["tensorflow"] = tf_elapsed
+                startup[backend] = onnx_elapsed
+            else:
+                tf_times.append(tf_elapsed)
+                onnx_times.append(onnx_elapsed)
+
+            compared += 1
+            if max(tf_scores, key=tf_scores.get) == max(onnx_scores, key=onnx_scores.get):
+                agreements += 1
+            score_diffs.append(sum(
+                abs(tf_scores[label] - onnx_scores[label]) for label in EMOTION_LABELS) / len(EMOTION_LABELS))
+
+        frame_count += 1
+
+    cap.release()
+
+    def mean_ms(times):
+        return sum(times) / len(times) * 1000 if times else 0.0
+
+    report = {
+        "video": video_path,
+        "backend": backend,
+        "face_crop": "shared DeepFace crop (opencv detector, align=True); "
+                     "the ONNX inference path itself uses an unaligned Haar crop",
+        "points_compared": compared,
+        "dominant_emotion_agreement": agreements / compared if compared else 0.0,
+        "mean_abs_score_diff": sum(score_diffs) / len(score_diffs) if score_diffs else 0.0,
+        "first_call_seconds": startup,
+        "mean_classifier_latency_ms": {
+            "tensorflow": mean_ms(tf_times),
+            backend: mean_ms(onnx_times)
+        }
+    }
+
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    output_dir, _, _ = get_output_paths(video_name)
+    report_path = os.path.join(output_dir, f"backend_agreement_{backend}.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"\n📋 Backend agreement report - {backend}:")
+    print("-" * 60)
+    print(f"  Face crop:           same aligned crop for both models (model-only comparison)")
+    print(f"  Points compared:     {compared}")
+    print(f"  Dominant agreement:  {report['dominant_emotion_agreement'] * 100:.1f}%")
+    print(f"  Mean |score diff|:   {report['mean_abs_score_diff']:.2f} points")
+    print(f"  Latency tensorflow:  {report['mean_classifier_latency_ms']['tensorflow']:.1f}ms/crop")
+    print(f"  Latency {backend:11s}: {report['mean_classifier_latency_ms'][backend]:.1f}ms/crop")
+    print(f"  Note: the {backend} inference path crops faces without eye alignment, "
+          f"so end-to-end results can differ more")
+    print(f"📁 Report: {report_path}")
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ONNX emotion backend tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("export", help="Export the Keras emotion model to ONNX")
+    subparsers.add_parser("quantize", help="Create the int8-quantized ONNX model")
+
+    compare_parser = subparsers.add_parser("compare", help="Agreement report against the TensorFlow path")
+    compare_parser.add_argument("video", help="Local sample video")
+    compare_parser.add_argument("--backend", default="onnx", choices=list(ONNX_BACKENDS))
+    compare_parser.add_argument("--max-points", type=int, default=100)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_emotion_model_to_onnx()
+    elif args.command == "quantize":
+        quantize_emotion_model()
+    else:
+        compare_backends(args.video, backend=args.backend, max_points=args.max_points)
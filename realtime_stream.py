@@ -0,0 +1,310 @@
+"""
+Real-time emotion analysis for live camera / RTSP sources.
+
+The reader thread keeps only the freshest decoded frame, so analysis never
+falls behind the source: frames that arrive while inference is busy are
+skipped, and frames older than the latency budget are dropped as stale.
+A local video file can be replayed at its native frame rate to stand in
+for a live source.
+"""
+
+import cv2
+import os
+import time
+import threading
+import argparse
+
+from analyze_with_output import analyze_frame_emotion, get_output_paths, save_analysis_results
+from results_store import FrameResultBuffer
+
+
+def parse_source(source):
+    """Turn a camera index string like '0' into an int, leave paths/URLs alone"""
+
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class LatestFrameGrabber:
+    """Background reader that only keeps the most recent frame of a source"""
+
+    def __init__(self, source, replay_realtime=False):
+        self.source = source
+        self.replay_realtime = replay_realtime
+        self.cap = cv2.VideoCapture(source)
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if self.fps <= 0:
+            self.fps = 30.0  # Default fallback
+
+        self.condition = threading.Condition()
+        self.latest = None  # (sequence, frame_number, capture_time, frame)
+        self.sequence = 0
+        self.frames_read = 0
+        self.frames_skipped = 0  # Overwritten before the analyzer picked them up
+        self.frames_consumed = 0  # Handed to the analyzer by get_latest()
+        self.consumed_sequence = 0
+        self.stopped = False
+        self.thread = None
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        start_time = time.monotonic()
+        frame_number = 0
+
+        try:
+            while not self.stopped:
+                # When replaying a file, wait until the frame would "arrive" live
+                if self.replay_realtime:
+                    due = start_time + frame_number / self.fps
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                capture_time = time.monotonic()
+
+                with self.condition:
+                    if self.latest is not None and self.latest[0] > self.consumed_sequence:
+                        self.frames_skipped += 1
+                    self.sequence += 1
+                    self.latest = (self.sequence, frame_number, capture_time, frame)
+                    self.frames_read += 1
+                    self.condition.notify_all()
+
+                frame_number += 1
+        finally:
+            # Released here, by the only thread that reads from it, so a read
+            # blocked on a stalled RTSP source never races with release()
+            self.cap.release()
+            with self.condition:
+                self.stopped = True
+                self.condition.notify_all()
+
+    def get_latest(self, timeout=1.0):
+        """Wait for a frame newer than the last one consumed, or None when the source ends"""
+
+        with self.condition:
+            while not self.stopped and (self.latest is None or self.latest[0] <= self.consumed_sequence):
+                self.condition.wait(timeout)
+
+            if self.latest is None or self.latest[0] <= self.consumed_sequence:
+                return None
+
+            self.consumed_sequence = self.latest[0]
+            self.frames_consumed += 1
+            return self.latest
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if self.thread is None:
+            self.cap.release()
+            return
+
+        self.thread.join(timeout=2.0)
+        if self.thread.is_alive():
+            print("⚠️  Reader still blocked in cap.read(); capture will be released when it returns")
+
+
+def summarize_latencies(latencies_ms):
+    """Mean / p50 / p95 / max of a list of latencies in milliseconds"""
+
+    if not latencies_ms:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+    ordered = sorted(latencies_ms)
+
+    def percentile(p):
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    return {
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "max": ordered[-1]
+    }
+
+
+def analyze_live_stream(source, stream_name=None, latency_budget=0.5, min_interval=0.1,
+                        max_duration=None, replay_realtime=False):
+    """
+    Analyze a live source in real time, always working on the freshest frame
+
+    Frames older than latency_budget seconds when picked up are dropped as stale.
+    min_interval keeps the 0.1 second analysis cadence when inference is faster
+    than the source. Set replay_realtime=True to replay a local file at its
+    native frame rate as a stand-in for a live feed.
+    """
+
+    source = parse_source(source)
+
+    if stream_name is None:
+        if isinstance(source, int):
+            stream_name = f"camera_{source}"
+        else:
+            stream_name = os.path.splitext(os.path.basename(str(source)))[0] or "live_stream"
+
+    output_dir, json_output, csv_output = get_output_paths(stream_name)
+
+    grabber = LatestFrameGrabber(source, replay_realtime=replay_realtime)
+    if not grabber.is_opened():
+        print(f"❌ Cannot open source: {source}")
+        return None
+
+    fps = grabber.fps
+
+    print("=== Starting real-time emotion analysis ===")
+    print(f"Source: {source}")
+    print(f"Output directory: {output_dir}")
+    print(f"Latency budget: {latency_budget * 1000:.0f}ms, Min interval: {min_interval:.2f}s")
+    if replay_realtime:
+        print(f"🔁 Replaying file at native {fps:.1f}fps as a live source")
+
+    results = FrameResultBuffer()
+    latencies_ms = []
+    frames_dropped_stale = 0
+    frames_skipped_cadence = 0
+    deadline_misses = 0
+    analysis_failures = 0
+    last_analysis_time = None
+
+    # Taken before the reader starts so live timestamps (capture_time - run_start) are never negative
+    run_start = time.monotonic()
+    grabber.start()
+
+    try:
+        while True:
+            if max_duration is not None and time.monotonic() - run_start >= max_duration:
+                print(f"✅ Reached {max_duration}s duration limit")
+                break
+
+            latest = grabber.get_latest()
+            if latest is None:
+                if grabber.stopped:
+                    print("✅ Source ended")
+                    break
+                continue
+
+            _, frame_number, capture_time, frame = latest
+            now = time.monotonic()
+
+            # Hold the 0.1s cadence; the next freshest frame will be picked up after
+            if last_analysis_time is not None and now - last_analysis_time < min_interval:
+                frames_skipped_cadence += 1
+                continue
+
+            # Drop frames that are already too old to be useful
+            if now - capture_time > latency_budget:
+                frames_dropped_stale += 1
+                continue
+
+            last_analysis_time = now
+            try:
+                frame_result = analyze_frame_emotion(frame, frame_number, fps)
+            except Exception as e:
+                analysis_failures += 1
+                if analysis_failures % 10 == 1:  # Only print errors occasionally
+                    print(f"Frame {frame_number} analysis failed: {e}")
+                continue
+
+            latency_ms = (time.monotonic() - capture_time) * 1000
+            latencies_ms.append(latency_ms)
+            if latency_ms > latency_budget * 1000:
+                deadline_misses += 1
+
+            if frame_result:
+                # Live sources have no meaningful frame clock, use wall time instead
+                if not replay_realtime:
+                    frame_result["timestamp_seconds"] = capture_time - run_start
+                results.append(frame_result)
+
+                if len(results) % 10 == 0:
+                    print(f"Analysis point {len(results):3d} - Frame {frame_number:5d} ({frame_result['timestamp_seconds']:6.1f}s): "
+                          f"{frame_result['dominant_emotion']} [{latency_ms:.0f}ms]")
+
+    except KeyboardInterrupt:
+        print("\n⏹️  User stopped real-time analysis")
+    finally:
+        grabber.stop()
+
+    elapsed = time.monotonic() - run_start
+    frames_read = grabber.frames_read
+    frames_dropped = grabber.frames_skipped + frames_dropped_stale
+
+    stream_stats = {
+        "mode": "realtime",
+        "replay_realtime": replay_realtime,
+        "latency_budget_ms": latency_budget * 1000,
+        "elapsed_seconds": elapsed,
+        "frames_read": frames_read,
+        "frames_analyzed": len(latencies_ms),
+        "frames_skipped": grabber.frames_skipped,
+        "frames_skipped_cadence": frames_skipped_cadence,
+        "frames_dropped_stale": frames_dropped_stale,
+        # Read but never picked up before the run stopped (at most one)
+        "frames_pending": frames_read - grabber.frames_skipped - grabber.frames_consumed,
+        "drop_rate": frames_dropped / frames_read if frames_read else 0.0,
+        "deadline_misses": deadline_misses,
+        "analysis_failures": analysis_failures,
+        "latency_ms": summarize_latencies(latencies_ms)
+    }
+
+    save_analysis_results(results, str(source), json_output, csv_output,
+                          extra_info={"stream_stats": stream_stats})
+    print_stream_stats(stream_stats)
+
+    return stream_stats
+
+
+def print_stream_stats(stream_stats):
+    """Print the end-to-end latency and drop rate report"""
+
+    latency = stream_stats["latency_ms"]
+
+    print(f"\n⏱️  Real-time stats ({stream_stats['elapsed_seconds']:.1f}s):")
+    print("-" * 60)
+    print(f"  Frames read:       {stream_stats['frames_read']}")
+    print(f"  Frames analyzed:   {stream_stats['frames_analyzed']}")
+    print(f"  Skipped (busy):    {stream_stats['frames_skipped']}")
+    print(f"  Skipped (cadence): {stream_stats['frames_skipped_cadence']}")
+    print(f"  Dropped (stale):   {stream_stats['frames_dropped_stale']}")
+    print(f"  Failed analyses:   {stream_stats['analysis_failures']}")
+    print(f"  Pending at stop:   {stream_stats['frames_pending']}")
+    print(f"  Drop rate:         {stream_stats['drop_rate'] * 100:.1f}%")
+    print(f"  Deadline misses:   {stream_stats['deadline_misses']}")
+    print(f"  Latency (ms):      mean {latency['mean']:.0f}, p50 {latency['p50']:.0f}, "
+          f"p95 {latency['p95']:.0f}, max {latency['max']:.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Real-time emotion analysis of a live source")
+    parser.add_argument("source", help="Camera index, RTSP/HTTP URL, or video file")
+    parser.add_argument("--name", help="Output name under Output_Files/")
+    parser.add_argument("--latency-budget", type=float, default=0.5, help="Max frame age in seconds")
+    parser.add_argument("--min-interval", type=float, default=0.1, help="Min seconds between analyses")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--replay", action="store_true",
+                        help="Replay a local file at its native frame rate as a live source")
+    args = parser.parse_args()
+
+    analyze_live_stream(
+        args.source,
+        stream_name=args.name,
+        latency_budget=args.latency_budget,
+        min_interval=args.min_interval,
+        max_duration=args.duration,
+        replay_realtime=args.replay
+    )
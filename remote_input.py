@@ -0,0 +1,432 @@
+"""
+Prefetching range-read input for videos on remote or slow storage.
+
+cv2.VideoCapture wants a path or URL it can seek in. Instead of copying the
+whole object first, a loopback HTTP server is put in front of it: the decoder
+reads from http://127.0.0.1:<port>/<name>, and every range it asks for is
+served from a bounded on-disk chunk cache filled with HTTP range requests
+against the origin, with the next few chunks prefetched in the background.
+Analysis starts as soon as the first chunks (and the index/moov atom) arrive,
+and the chunk cache never holds more than max_cached_chunks * chunk_size
+(plus the chunks still being downloaded).
+
+For testing, serve_directory() starts a range-capable (optionally throttled)
+HTTP server over a local folder as a stand-in for the object store.
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+READ_BLOCK_SIZE = 256 * 1024
+
+
+def is_remote_url(path):
+    return isinstance(path, str) and path.lower().startswith(("http://", "https://"))
+
+
+def check_range_response(response, url, start, end):
+    """
+    Require a 206 whose Content-Range covers exactly bytes start-end; return the
+    total object size. A server that ignores Range would otherwise send the
+    whole object, which must never be cached as a single chunk.
+    """
+
+    content_range = response.headers.get("Content-Range", "")
+    if response.status != 206:
+        raise IOError(f"{url} does not support range requests: asked for bytes {start}-{end}, "
+                      f"got HTTP {response.status} (Content-Range: {content_range or 'missing'})")
+
+    unit, _, spec = content_range.partition(" ")
+    served, _, total = spec.partition("/")
+    if unit != "bytes" or served != f"{start}-{end}" or not total.isdigit():
+        raise IOError(f"{url} returned Content-Range '{content_range}' for a range request of bytes {start}-{end}")
+    return int(total)
+
+
+def remote_video_name(url):
+    """File name without extension from a URL path (query string ignored)"""
+
+    return os.path.splitext(os.path.basename(urllib.parse.urlparse(url).path))[0] or "remote_video"
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """Serve GET/HEAD with byte-range support from server.source (size + read(offset, length))"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def _parse_range(self, size):
+        range_header = self.headers.get("Range")
+        if not range_header or not range_header.startswith("bytes="):
+            return None
+
+        first, _, last = range_header[len("bytes="):].split(",")[0].strip().partition("-")
+        if first == "":
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        return start, end
+
+    def get_source(self):
+        """Source for the requested path, or None for 404"""
+
+        source_path = getattr(self.server, "source_path", None)
+        if source_path is not None and urllib.parse.unquote(self.path.split("?")[0]) != source_path:
+            return None
+        return self.server.source
+
+    def _serve(self, head):
+        source = self.get_source()
+        if source is None:
+            self.send_error(404)
+            return
+        size = source.size
+
+        byte_range = self._parse_range(size)
+        if byte_range is not None and byte_range[0] >= size:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = byte_range if byte_range is not None else (0, size - 1)
+
+        self.send_response(206 if byte_range is not None else 200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if byte_range is not None:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+
+        if head:
+            return
+
+        bandwidth = getattr(self.server, "bandwidth", None)
+        offset = start
+        try:
+            while offset <= end:
+                data = source.read(offset, min(READ_BLOCK_SIZE, end - offset + 1))
+                if not data:
+                    break
+                self.wfile.write(data)
+                offset += len(data)
+                if bandwidth:
+                    time.sleep(len(data) / bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            # The decoder drops connections whenever it seeks elsewhere
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_range_server(source, source_path=None, bandwidth=None):
+    """Start a threaded range server for source on 127.0.0.1 (random port)"""
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+    server.daemon_threads = True
+    server.source = source
+    server.source_path = source_path
+    server.bandwidth = bandwidth
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class LocalFileSource:
+    """A local file exposed through the range server"""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+
+    def read(self, offset, length):
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+
+class DirectoryRangeHandler(RangeRequestHandler):
+    """Range handler that serves any file under server.root"""
+
+    def get_source(self):
+        root = os.path.abspath(self.server.root)
+        relative = urllib.parse.unquote(self.path.split("?")[0]).lstrip("/")
+        path = os.path.abspath(os.path.join(root, relative))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return None
+        return LocalFileSource(path)
+
+
+def serve_directory(root, bandwidth_mbps=None):
+    """Range-capable HTTP server over a local folder, standing in for the object store"""
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DirectoryRangeHandler)
+    server.daemon_threads = True
+    server.root = root
+    server.bandwidth = bandwidth_mbps * 1024 * 1024 / 8 if bandwidth_mbps else None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class PrefetchingRemoteSource:
+    """
+    Bounded on-disk chunk cache over an HTTP object, filled with range requests
+
+    Missing chunks are fetched on demand in the reading thread; the read_ahead
+    chunks after each read are fetched by background workers. Least recently
+    used chunks outside the read-ahead window are evicted once more than
+    max_cached_chunks are on disk.
+    """
+
+    def __init__(self, url, chunk_size=4 * 1024 * 1024, read_ahead=4, max_cached_chunks=16,
+                 prefetch_workers=2, timeout=30):
+        self.url = url
+        self.chunk_size = chunk_size
+        self.read_ahead = read_ahead
+        self.max_cached_chunks = max(max_cached_chunks, read_ahead + 2)
+        self.timeout = timeout
+
+        self.created = time.monotonic()
+        self.size = self._probe_size()
+        self.num_chunks = (self.size + chunk_size - 1) // chunk_size
+
+        self.cache_dir = tempfile.mkdtemp(prefix="remote_video_")
+        self.chunks = OrderedDict()  # chunk index -> file path, in LRU order
+        self.pending = {}  # chunk index -> Future
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=prefetch_workers)
+        self.position = 0  # Chunk index of the latest read
+
+        self.bytes_downloaded = 0
+        self.range_requests = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.wait_seconds = 0.0
+        self.cached_bytes = 0
+        self.peak_cached_bytes = 0
+        self.first_byte_seconds = None
+
+    def _probe_size(self):
+        request = urllib.request.Request(self.url, headers={"Range": "bytes=0-0"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return check_range_response(response, self.url, 0, 0)
+
+    def _download(self, index, future):
+        try:
+            start = index * self.chunk_size
+            end = min(self.size, start + self.chunk_size) - 1
+            request = urllib.request.Request(self.url, headers={"Range": f"bytes={start}-{end}"})
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                check_range_response(response, self.url, start, end)
+                data = response.read()
+            if len(data) != end - start + 1:
+                raise IOError(f"{self.url}: expected {end - start + 1} bytes for chunk {index}, got {len(data)}")
+
+            path = os.path.join(self.cache_dir, f"chunk_{index:06d}")
+            with open(path, "wb") as f:
+                f.write(data)
+
+            with self.lock:
+                if self.first_byte_seconds is None:
+                    self.first_byte_seconds = time.monotonic() - self.created
+                self.range_requests += 1
+                self.bytes_downloaded += len(data)
+                self.chunks[index] = path
+                self.cached_bytes += len(data)
+                self.pending.pop(index, None)
+                self._evict()
+                self.peak_cached_bytes = max(self.peak_cached_bytes, self.cached_bytes)
+
+            future.set_result(path)
+        except Exception as e:
+            with self.lock:
+                self.pending.pop(index, None)
+            future.set_exception(e)
+
+    def _evict(self):
+        """Drop least recently used chunks outside the read-ahead window (lock held)"""
+
+        protected = range(self.position, self.position + self.read_ahead + 1)
+        for index in list(self.chunks):
+            if len(self.chunks) <= self.max_cached_chunks:
+                break
+            if index in protected:
+                continue
+            path = self.chunks.pop(index)
+            self.cached_bytes -= os.path.getsize(path)
+            os.remove(path)
+
+    def _chunk_path(self, index):
+        """Path of a cached chunk, downloading it in this thread if nobody else is"""
+
+        with self.lock:
+            if index in self.chunks:
+                self.chunks.move_to_end(index)
+                self.cache_hits += 1
+                return self.chunks[index]
+
+            self.cache_misses += 1
+            future = self.pending.get(index)
+            download_here = future is None
+            if download_here:
+                future = Future()
+                self.pending[index] = future
+
+        started = time.monotonic()
+        if download_here:
+            self._download(index, future)
+        path = future.result()
+        with self.lock:
+            self.wait_seconds += time.monotonic() - started
+        return path
+
+    def _prefetch(self, index):
+        with self.lock:
+            for ahead in range(index + 1, min(self.num_chunks, index + 1 + self.read_ahead)):
+                if ahead not in self.chunks and ahead not in self.pending:
+                    future = Future()
+                    self.pending[ahead] = future
+                    self.executor.submit(self._download, ahead, future)
+
+    def read(self, offset, length):
+        """Read up to length bytes at offset (never past the end of one chunk)"""
+
+        if offset >= self.size:
+            return b""
+
+        index = offset // self.chunk_size
+        with self.lock:
+            self.position = index
+
+        for _ in range(3):
+            path = self._chunk_path(index)
+            self._prefetch(index)
+            try:
+                with open(path, "rb") as f:
+                    f.seek(offset - index * self.chunk_size)
+                    return f.read(min(length, (index + 1) * self.chunk_size - offset))
+            except FileNotFoundError:
+                # Evicted by another connection between lookup and open; fetch again
+                continue
+        raise IOError(f"Chunk {index} of {self.url} kept getting evicted")
+
+    def stats(self):
+        return {
+            "size_bytes": self.size,
+            "chunk_size": self.chunk_size,
+            "read_ahead_chunks": self.read_ahead,
+            "range_requests": self.range_requests,
+            "bytes_downloaded": self.bytes_downloaded,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "wait_seconds": self.wait_seconds,
+            "peak_cached_bytes": self.peak_cached_bytes,
+            "time_to_first_byte_seconds": self.first_byte_seconds
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+class PrefetchingVideoInput:
+    """Loopback URL for cv2.VideoCapture backed by a PrefetchingRemoteSource"""
+
+    def __init__(self, url, **cache_options):
+        self.url = url
+        self.cache_options = cache_options
+        self.source = None
+        self.server = None
+        self.local_url = None
+
+    def start(self):
+        self.source = PrefetchingRemoteSource(self.url, **self.cache_options)
+        name = os.path.basename(urllib.parse.urlparse(self.url).path) or "video.mp4"
+        self.server = start_range_server(self.source, source_path=f"/{name}")
+        self.local_url = f"http://127.0.0.1:{self.server.server_address[1]}/{urllib.parse.quote(name)}"
+        return self
+
+    def stats(self):
+        return self.source.stats() if self.source else {}
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.source is not None:
+            self.source.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def benchmark_remote_input(video_path, bandwidth_mbps=None, emotion_backend="tensorflow"):
+    """
+    Serve a local video through a stand-in object store and analyze it by URL,
+    reporting time-to-first-result and throughput
+    """
+
+    from analyze_with_output import analyze_video_with_output, get_output_paths
+
+    origin = serve_directory(os.path.dirname(os.path.abspath(video_path)), bandwidth_mbps)
+    url = (f"http://127.0.0.1:{origin.server_address[1]}/"
+           f"{urllib.parse.quote(os.path.basename(video_path))}")
+
+    print(f"🌐 Stand-in object store: {url}"
+          + (f" (throttled to {bandwidth_mbps} Mbit/s)" if bandwidth_mbps else ""))
+
+    try:
+        analyze_video_with_output(url, emotion_backend=emotion_backend, generate_video=False)
+    finally:
+        origin.shutdown()
+        origin.server_close()
+
+    _, json_output, _ = get_output_paths(remote_video_name(url))
+    with open(json_output, 'r', encoding='utf-8') as f:
+        video_info = json.load(f)["video_info"]
+
+    remote_stats = video_info.get("remote_input", {})
+    print(f"\n🌐 Remote input report - {os.path.basename(video_path)}:")
+    print("-" * 60)
+    print(f"  Time to first result:  {video_info.get('time_to_first_result_seconds') or 0:.2f}s")
+    print(f"  Analysis throughput:   {video_info.get('analysis_points_per_second', 0):.2f} points/s")
+    print(f"  Downloaded:            {remote_stats.get('bytes_downloaded', 0) / (1024 * 1024):.1f}MB "
+          f"of {remote_stats.get('size_bytes', 0) / (1024 * 1024):.1f}MB "
+          f"in {remote_stats.get('range_requests', 0)} range requests")
+    print(f"  Peak local cache:      {remote_stats.get('peak_cached_bytes', 0) / (1024 * 1024):.1f}MB")
+    print(f"  Decoder waits:         {remote_stats.get('cache_misses', 0)} misses, "
+          f"{remote_stats.get('wait_seconds', 0):.2f}s waiting")
+
+    return video_info
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a local video through a stand-in remote object store")
+    parser.add_argument("video", help="Local video to serve over HTTP")
+    parser.add_argument("--bandwidth-mbps", type=float, help="Throttle the stand-in store (Mbit/s)")
+    parser.add_argument("--backend", default="tensorflow", help="tensorflow, onnx or onnx-int8")
+    args = parser.parse_args()
+
+    benchmark_remote_input(args.video, bandwidth_mbps=args.bandwidth_mbps, emotion_backend=args.backend)
@@ -0,0 +1,210 @@
+"""
+Render-only mode: regenerate the annotated video from stored results.
+
+Reads an existing emotion_analysis_<name>.json (or the .bin store), splits the
+video into frame segments rendered in parallel by generate_emotion_video, and
+joins the segment files with ffmpeg's concat demuxer using stream copy, so
+the join itself does not re-encode. No emotion inference is run.
+"""
+
+import cv2
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from analyze_with_output import generate_emotion_video, get_output_paths, open_video_writer
+from chunked_analysis import get_video_properties, split_segments
+from results_store import ResultsStore, load_result_rows, rows_to_results
+
+
+def load_render_rows(results_path):
+    """Stored results as a RESULT_DTYPE array, from a .json or .bin file"""
+
+    if results_path.endswith(".bin"):
+        return ResultsStore(results_path).rows
+    return load_result_rows(results_path)
+
+
+def select_writer_config(video_path, probe_path):
+    """
+    Run the codec fallback search once, in the parent, so every segment is
+    encoded with the same configuration and can be joined with stream copy
+    """
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0:
+        fps = 30.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+
+    writer, writer_config = open_video_writer(probe_path, fps, width, height)
+    if writer is not None:
+        writer.release()
+    if os.path.exists(probe_path):
+        os.remove(probe_path)
+    return writer_config
+
+
+def segment_format(path):
+    """(fourcc, fps, width, height) of a rendered segment"""
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+    video_format = (int(cap.get(cv2.CAP_PROP_FOURCC)), round(cap.get(cv2.CAP_PROP_FPS), 3),
+                    int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    cap.release()
+    return video_format
+
+
+def rows_in_segment(rows, start_frame, end_frame):
+    """Stored rows whose frame falls in [start_frame, end_frame)"""
+
+    return rows[(rows["frame_number"] >= start_frame) & (rows["frame_number"] < end_frame)]
+
+
+def concat_segments(segment_paths, output_path):
+    """Join segment files without re-encoding (ffmpeg concat demuxer, stream copy)"""
+
+    list_path = os.path.splitext(output_path)[0] + "_segments.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("\\", "/").replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", list_path, "-c", "copy", output_path],
+            check=True
+        )
+    finally:
+        os.remove(list_path)
+
+    return output_path
+
+
+def render_from_results(video_path, results_path=None, output_path=None, num_workers=None,
+                        max_seconds=None):
+    """
+    Render an annotated MP4 from stored results, in parallel segments
+
+    results_path defaults to Output_Files/<name>/emotion_analysis_<name>.json and
+    output_path to Output_Files/<name>/analyzed_<name>.mp4.
+    """
+
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    # Only the default paths live under Output_Files/<name>/; nothing is created until needed
+    default_dir, default_json, _ = get_output_paths(video_name, create=False)
+
+    results_path = results_path or default_json
+    output_path = output_path or os.path.join(default_dir, f"analyzed_{video_name}.mp4")
+
+    if not os.path.exists(results_path):
+        print(f"❌ Analysis results file does not exist: {results_path}")
+        return None
+
+    fps, total_frames = get_video_properties(video_path)
+    if fps is None:
+        print(f"❌ Cannot open video: {video_path}")
+        return None
+    if max_seconds is not None:
+        total_frames = min(total_frames, int(fps * max_seconds))
+
+    rows = load_render_rows(results_path)
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Without ffmpeg the segments cannot be joined losslessly, so render in one pass
+    if shutil.which("ffmpeg") is None:
+        print("⚠️  ffmpeg not found on PATH - rendering with a single worker")
+        num_workers = 1
+    num_workers = num_workers or os.cpu_count() or 1
+    segments = split_segments(total_frames, num_workers)
+    if not segments:
+        # Frame count unknown: render until the decoder runs out
+        segments = [(0, sys.maxsize)]
+
+    print("=== Render-only: regenerating annotated video from stored results ===")
+    print(f"Input video: {video_path}")
+    print(f"Results: {results_path} ({len(rows)} analysis points)")
+    print(f"Output video: {output_path}")
+    print(f"Segments: {len(segments)}, workers: {num_workers}")
+
+    started = time.monotonic()
+
+    if len(segments) == 1:
+        start, end = segments[0]
+        output = generate_emotion_video(video_path, output_path, rows_to_results(rows),
+                                        start_frame=start, end_frame=end)
+        print(f"⏱️  Render finished in {time.monotonic() - started:.1f}s")
+        return output
+
+    segment_dir = tempfile.mkdtemp(prefix=f"render_{video_name}_", dir=output_dir)
+    try:
+        writer_config = select_writer_config(video_path, os.path.join(segment_dir, "writer_probe.mp4"))
+        if writer_config is None:
+            print("❌ Failed to initialize video writer with any configuration")
+            return None
+        print(f"🔧 All segments use: {writer_config['description']}")
+
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = []
+            for index, (start, end) in enumerate(segments):
+                # Each worker only receives the results that fall inside its segment
+                segment_path = os.path.join(segment_dir, f"segment_{index:04d}.mp4")
+                futures.append(executor.submit(generate_emotion_video, video_path, segment_path,
+                                               rows_to_results(rows_in_segment(rows, start, end)),
+                                               start_frame=start, end_frame=end,
+                                               writer_config=writer_config))
+
+            segment_paths = [future.result() for future in futures]
+
+        if any(path is None for path in segment_paths):
+            print("❌ One or more segments failed to render")
+            return None
+
+        # Stream copy only works when every segment has the same codec, rate and size
+        formats = [segment_format(path) for path in segment_paths]
+        if None in formats or len(set(formats)) != 1:
+            print("❌ Segments were encoded differently, refusing to join them with stream copy:")
+            for path, video_format in zip(segment_paths, formats):
+                print(f"   {os.path.basename(path)}: {video_format}")
+            return None
+
+        concat_segments(segment_paths, output_path)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+    elapsed = time.monotonic() - started
+    cap = cv2.VideoCapture(output_path)
+    frames_out = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+    cap.release()
+
+    print(f"✅ Rendered {frames_out} frames in {elapsed:.1f}s: {output_path}")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render an annotated video from stored emotion results")
+    parser.add_argument("video", help="Original input video")
+    parser.add_argument("--results", help="emotion_analysis_<name>.json or .bin (default: Output_Files/<name>/)")
+    parser.add_argument("--output", help="Output MP4 path (default: Output_Files/<name>/analyzed_<name>.mp4)")
+    parser.add_argument("--workers", type=int, help="Parallel render workers (default: CPU count)")
+    parser.add_argument("--max-seconds", type=float, help="Only render the first N seconds")
+    args = parser.parse_args()
+
+    render_from_results(
+        args.video,
+        results_path=args.results,
+        output_path=args.output,
+        num_workers=args.workers,
+        max_seconds=args.max_seconds
+    )
@@ -0,0 +1,309 @@
+"""
+Memory-mapped binary results store with time-range queries.
+
+emotion_analysis_<name>.bin is written next to the JSON file: a 16-byte
+header followed by fixed-width 48-byte rows of
+
+    frame_number (int64), timestamp (float64), dominant-emotion code (uint8),
+    3 padding bytes, 7 emotion scores (float32, in EMOTION_LABELS order)
+
+The padding keeps every field naturally aligned in the mapped file, so the
+timestamp column can be searched in place instead of being copied first.
+Scores are narrowed to float32 only in this file; in memory and in the
+JSON/CSV output they stay float64.
+
+Rows are in timestamp order, so a time range is found by binary search over
+the memory-mapped timestamp column and only the pages covering that range
+are ever read.
+"""
+
+import os
+import struct
+import argparse
+import numpy as np
+
+from analyze_with_output import EMOTION_LABELS
+
+MAGIC = b"EMOB"
+VERSION = 2  # 2: aligned 48-byte rows (1 was packed into 45 bytes)
+HEADER_FORMAT = "<4sIII"  # magic, version, row size, number of emotions
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# In-memory rows (FrameResultBuffer, JSON/CSV output): full-precision scores
+RESULT_DTYPE = np.dtype([
+    ("frame_number", "<i8"),
+    ("timestamp", "<f8"),
+    ("dominant", "u1"),
+    ("scores", "<f8", (len(EMOTION_LABELS),)),
+], align=True)
+
+# On-disk rows of the .bin store: compact float32 scores, 48 bytes per row
+STORE_DTYPE = np.dtype([
+    ("frame_number", "<i8"),
+    ("timestamp", "<f8"),
+    ("dominant", "u1"),
+    ("scores", "<f4", (len(EMOTION_LABELS),)),
+], align=True)
+
+EMOTION_CODES = {emotion: code for code, emotion in enumerate(EMOTION_LABELS)}
+
+
+class FrameResultBuffer:
+    """
+    Growable RESULT_DTYPE array that the analysis loops append to instead of
+    keeping a dict per sample; the JSON/CSV schema is only produced on save.
+    """
+
+    def __init__(self, capacity=1024):
+        self._rows = np.zeros(max(1, capacity), dtype=RESULT_DTYPE)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, needed):
+        if needed > len(self._rows):
+            grown = np.zeros(max(needed, 2 * len(self._rows)), dtype=RESULT_DTYPE)
+            grown[:self._size] = self._rows[:self._size]
+            self._rows = grown
+
+    def append(self, result):
+        """Append one result dict (JSON schema)"""
+
+        self._reserve(self._size + 1)
+        emotions = result["emotions"]
+        self._rows[self._size] = (
+            result["frame_number"],
+            result["timestamp_seconds"],
+            EMOTION_CODES[result["dominant_emotion"]],
+            [emotions.get(emotion, 0.0) for emotion in EMOTION_LABELS]
+        )
+        self._size += 1
+
+    def extend(self, rows):
+        """Append a RESULT_DTYPE (or STORE_DTYPE) array"""
+
+        self._reserve(self._size + len(rows))
+        self._rows[self._size:self._size + len(rows)] = rows
+        self._size += len(rows)
+
+    def sort(self):
+        """Order rows by timestamp (queries and summaries rely on it)"""
+
+        rows = self.array
+        rows[:] = rows[np.argsort(rows["timestamp"], kind="stable")]
+
+    @property
+    def array(self):
+        """View of the filled rows"""
+        return self._rows[:self._size]
+
+
+def results_to_array(results):
+    """Convert a list of result dicts (JSON schema) to a RESULT_DTYPE array"""
+
+    buffer = FrameResultBuffer(len(results))
+    for result in results:
+        buffer.append(result)
+
+    # Queries rely on timestamp order
+    buffer.sort()
+    return buffer.array
+
+
+def as_result_rows(results):
+    """Accept a FrameResultBuffer, RESULT_DTYPE/STORE_DTYPE array or list of result dicts"""
+
+    if isinstance(results, FrameResultBuffer):
+        return results.array
+    if isinstance(results, np.ndarray):
+        return results
+    return results_to_array(results)
+
+
+def rows_to_results(rows):
+    """Convert rows back to the JSON result schema"""
+
+    return [
+        {
+            "frame_number": int(row["frame_number"]),
+            "timestamp_seconds": float(row["timestamp"]),
+            "dominant_emotion": EMOTION_LABELS[row["dominant"]],
+            "emotions": {emotion: float(score) for emotion, score in zip(EMOTION_LABELS, row["scores"])}
+        }
+        for row in rows
+    ]
+
+
+def rows_to_dataframe(rows):
+    """Build the CSV layout (one column per emotion) with column-wise operations"""
+
+    import pandas as pd
+
+    df = pd.DataFrame({
+        "frame_number": rows["frame_number"],
+        "timestamp_seconds": rows["timestamp"],
+        "dominant_emotion": np.array(EMOTION_LABELS)[rows["dominant"]]
+    })
+    for code, emotion in enumerate(EMOTION_LABELS):
+        df[emotion] = rows["scores"][:, code].astype(np.float64)
+    return df
+
+
+def load_result_rows(json_path):
+    """
+    Load results for a JSON results file as a structured array, preferring
+    the memory-mapped .bin store (STORE_DTYPE) next to it when it is up to date
+    """
+
+    bin_path = os.path.splitext(json_path)[0] + ".bin"
+    if os.path.exists(bin_path) and os.path.getmtime(bin_path) >= os.path.getmtime(json_path):
+        try:
+            return ResultsStore(bin_path).rows
+        except ValueError:
+            pass  # Older store layout: fall back to the JSON file
+
+    import json
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return results_to_array(data['results'])
+
+
+def load_video_info(json_path, chunk_size=64 * 1024):
+    """
+    Read only the video_info block of a JSON results file. save_analysis_results
+    writes it before the results list, so the rest of the file is never parsed.
+    """
+
+    import json
+
+    decoder = json.JSONDecoder()
+    key = '"video_info"'
+    text = ""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            text += chunk
+            colon = text.find(":", text.find(key) + len(key)) if key in text else -1
+            if colon >= 0:
+                value_start = len(text) - len(text[colon + 1:].lstrip())
+                try:
+                    return decoder.raw_decode(text, value_start)[0]
+                except json.JSONDecodeError:
+                    pass  # Block not fully read yet
+            if not chunk:
+                return {}
+
+
+def write_results_store(rows, path):
+    """Write a results array (or list of result dicts) as a binary store"""
+
+    rows = as_result_rows(rows)
+    if len(rows) > 1 and np.any(np.diff(rows["timestamp"]) < 0):
+        rows = rows[np.argsort(rows["timestamp"], kind="stable")]
+
+    with open(path, "wb") as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, STORE_DTYPE.itemsize, len(EMOTION_LABELS)))
+        f.write(rows.astype(STORE_DTYPE, copy=False).tobytes())
+    return path
+
+
+def parse_time(value):
+    """Parse seconds given as a number, 'mm:ss' or 'hh:mm:ss'"""
+
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    seconds = 0.0
+    for part in str(value).split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+class ResultsStore:
+    """Read-only, memory-mapped view of a binary results file"""
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, "rb") as f:
+            magic, version, row_size, num_emotions = struct.unpack(HEADER_FORMAT, f.read(HEADER_SIZE))
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a results store (or unsupported version): {path}")
+        if row_size != STORE_DTYPE.itemsize or num_emotions != len(EMOTION_LABELS):
+            raise ValueError(f"Results store row layout does not match: {path}")
+
+        count = (os.path.getsize(path) - HEADER_SIZE) // row_size
+        if count > 0:
+            self.rows = np.memmap(path, dtype=STORE_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.rows = np.zeros(0, dtype=STORE_DTYPE)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def time_range(self, start=None, end=None):
+        """Rows with start <= timestamp < end, as a view into the mapped file"""
+
+        timestamps = self.rows["timestamp"]
+        lo = 0 if start is None else int(np.searchsorted(timestamps, parse_time(start), side="left"))
+        hi = len(self.rows) if end is None else int(np.searchsorted(timestamps, parse_time(end), side="left"))
+        return self.rows[lo:hi]
+
+    def rollup(self, period=1.0, start=None, end=None):
+        """
+        Mean emotion scores per time bucket (period seconds, e.g. 1 or 60)
+
+        Returns (bucket_start_seconds, mean_scores[n_buckets, 7]) for non-empty buckets.
+        """
+
+        rows = self.time_range(start, end)
+        if len(rows) == 0:
+            return np.zeros(0), np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32)
+
+        buckets = np.floor(rows["timestamp"] / period).astype(np.int64)
+        # Rows are sorted, so each bucket is a contiguous run
+        run_starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        sums = np.add.reduceat(rows["scores"].astype(np.float64), run_starts, axis=0)
+        counts = np.diff(np.r_[run_starts, len(rows)])
+
+        return buckets[run_starts] * period, (sums / counts[:, None]).astype(np.float32)
+
+    def dominant_histogram(self, start=None, end=None):
+        """Count of each dominant emotion within a time range"""
+
+        rows = self.time_range(start, end)
+        counts = np.bincount(rows["dominant"], minlength=len(EMOTION_LABELS))
+        return {emotion: int(counts[code]) for code, emotion in enumerate(EMOTION_LABELS)}
+
+    def to_results(self, rows):
+        """Convert rows back to the JSON result schema"""
+
+        return rows_to_results(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a binary emotion results store")
+    parser.add_argument("store", help="Path to emotion_analysis_<name>.bin")
+    parser.add_argument("--start", help="Range start (seconds, mm:ss or hh:mm:ss)")
+    parser.add_argument("--end", help="Range end (seconds, mm:ss or hh:mm:ss)")
+    parser.add_argument("--rollup", choices=["second", "minute"], help="Print mean scores per bucket")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.store)
+    rows = store.time_range(args.start, args.end)
+    print(f"📦 {args.store}: {len(store)} rows, {len(rows)} in range")
+
+    histogram = store.dominant_histogram(args.start, args.end)
+    for emotion, count in sorted(histogram.items(), key=lambda x: x[1], reverse=True):
+        if count:
+            print(f"  {emotion:8s}: {count:5d}")
+
+    if args.rollup:
+        period = 1.0 if args.rollup == "second" else 60.0
+        bucket_starts, means = store.rollup(period, args.start, args.end)
+        for bucket_start, mean_scores in zip(bucket_starts, means):
+            top = EMOTION_LABELS[int(np.argmax(mean_scores))]
+            print(f"  {bucket_start:8.0f}s  {top:8s}  " + " ".join(f"{score:6.2f}" for score in mean_scores))
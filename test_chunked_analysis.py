@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tests for splitting a video's frame range into parallel segments
+"""
+
+from chunked_analysis import split_segments
+
+
+def covered_frames(segments):
+    return [frame for start, end in segments for frame in range(start, end)]
+
+
+def test_segments_partition_the_frame_range():
+    for total_frames in (1, 7, 30, 450, 1001):
+        for num_segments in (1, 2, 3, 8):
+            segments = split_segments(total_frames, num_segments)
+            # Contiguous, non-empty, no gaps and no overlaps
+            assert covered_frames(segments) == list(range(total_frames))
+            assert all(start < end for start, end in segments)
+            assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+
+
+def test_segments_are_balanced():
+    segments = split_segments(1000, 3)
+    assert len(segments) == 3
+    lengths = [end - start for start, end in segments]
+    assert max(lengths) - min(lengths) <= 1
+
+
+def test_more_segments_than_frames():
+    assert split_segments(3, 8) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_sample_points_land_in_exactly_one_segment():
+    # 0.1s sampling at 30fps: every third frame
+    analysis_interval = 3
+    segments = split_segments(451, 4)
+    sampled = [frame for start, end in segments for frame in range(start, end) if frame % analysis_interval == 0]
+    assert sampled == list(range(0, 451, analysis_interval))
+
+
+def test_no_frames():
+    assert split_segments(0, 4) == []
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the perceptual-hash crop cache
+"""
+
+import numpy as np
+
+from face_cache import PerceptualHashCache, dhash, hamming_distance
+
+
+def face_crop(seed=0, size=96):
+    """Deterministic grayscale 'face': a smooth random pattern"""
+
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (12, 12)).astype(np.float32)
+    return np.kron(coarse, np.ones((size // 12, size // 12), dtype=np.float32)).astype(np.uint8)
+
+
+def test_dhash_is_64_bits_and_stable():
+    crop = face_crop()
+    assert dhash(crop) == dhash(crop.copy())
+    assert 0 <= dhash(crop) < 2 ** 64
+    assert dhash(crop, hash_size=4) < 2 ** 16
+
+
+def test_dhash_tolerates_small_changes():
+    crop = face_crop()
+
+    # Slight brightness change and sensor noise: the hash barely moves
+    brighter = np.clip(crop.astype(np.int16) + 10, 0, 255).astype(np.uint8)
+    noisy = np.clip(crop + np.random.default_rng(1).normal(0, 2, crop.shape), 0, 255).astype(np.uint8)
+    assert hamming_distance(dhash(crop), dhash(brighter)) <= 4
+    assert hamming_distance(dhash(crop), dhash(noisy)) <= 4
+
+    # A different face is far away
+    assert hamming_distance(dhash(crop), dhash(face_crop(seed=7))) > 4
+
+
+def test_hamming_distance():
+    assert hamming_distance(0, 0) == 0
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(2 ** 64 - 1, 0) == 64
+
+
+def test_cache_hits_within_tolerance():
+    cache = PerceptualHashCache(max_distance=2)
+    scores = {"happy": 90.0, "neutral": 10.0}
+    cache.put(0b1111, scores)
+
+    assert cache.get(0b1111) is scores  # Exact
+    assert cache.get(0b1100) is scores  # 2 bits away
+    assert cache.get(0b1000) is None  # 3 bits away
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert abs(stats["hit_rate"] - 2 / 3) < 1e-9
+
+
+def test_zero_tolerance_only_matches_exactly():
+    cache = PerceptualHashCache(max_distance=0)
+    cache.put(0b1111, {"happy": 100.0})
+
+    assert cache.get(0b1111) is not None
+    assert cache.get(0b1110) is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PerceptualHashCache(capacity=2, max_distance=0)
+    cache.put(1, {"angry": 1.0})
+    cache.put(2, {"sad": 1.0})
+
+    # Touch 1 so that 2 becomes the least recently used entry
+    assert cache.get(1) is not None
+    cache.put(4, {"fear": 1.0})
+
+    assert len(cache.entries) == 2
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.get(4) is not None
+
+
+def test_most_recent_match_wins():
+    cache = PerceptualHashCache(max_distance=4)
+    cache.put(0b0000, {"sad": 100.0})
+    cache.put(0b0011, {"happy": 100.0})
+
+    # Within tolerance of both: the most recently used entry is returned
+    assert cache.get(0b0001) == {"happy": 100.0}
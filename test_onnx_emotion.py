@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the emotion model input preprocessing and ONNX backend lookup
+"""
+
+import numpy as np
+import pytest
+
+from analyze_with_output import emotion_model_input
+from onnx_emotion import OnnxEmotionClassifier, get_onnx_classifier
+
+
+def test_uint8_input_is_scaled_to_unit_range():
+    face = np.full((48, 48), 255, dtype=np.uint8)
+    face[:, :24] = 0
+
+    model_input = emotion_model_input(face)
+    assert model_input.shape == (48, 48)
+    assert model_input.dtype == np.float32
+    assert model_input.min() == 0.0
+    assert model_input.max() == 1.0
+    assert np.allclose(model_input[:, 24:], 1.0)
+
+
+def test_float_input_is_not_rescaled():
+    # DeepFace.extract_faces already returns faces in [0, 1]
+    face = np.full((96, 96), 0.5, dtype=np.float32)
+
+    model_input = emotion_model_input(face)
+    assert model_input.shape == (48, 48)
+    assert np.allclose(model_input, 0.5)
+
+
+def test_non_square_input_is_zero_padded_and_centred():
+    # Wide crop: 24 rows x 48 columns -> 48x48 with 12 black rows above and below
+    wide = np.full((24, 48), 255, dtype=np.uint8)
+    model_input = emotion_model_input(wide)
+    assert model_input.shape == (48, 48)
+    assert np.allclose(model_input[:12], 0.0)
+    assert np.allclose(model_input[36:], 0.0)
+    assert np.allclose(model_input[13:35], 1.0)
+
+    # Tall crop is padded left and right instead, and the aspect ratio is kept
+    tall = np.full((96, 48), 255, dtype=np.uint8)
+    model_input = emotion_model_input(tall)
+    assert np.allclose(model_input[:, :12], 0.0)
+    assert np.allclose(model_input[:, 36:], 0.0)
+    assert np.allclose(model_input[:, 13:35], 1.0)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown ONNX backend"):
+        get_onnx_classifier("bogus")
+
+
+def test_missing_model_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        OnnxEmotionClassifier(str(tmp_path / "missing.onnx"))
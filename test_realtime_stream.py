@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for real-time analysis, replaying a local file as a live source
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+import realtime_stream
+from analyze_with_output import EMOTION_LABELS
+
+
+def write_clip(path, frames=60, fps=30.0, size=(160, 120)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for i in range(frames):
+        frame = np.full((size[1], size[0], 3), (i * 4) % 255, dtype=np.uint8)
+        cv2.circle(frame, (20 + i, size[1] // 2), 15, (0, 0, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def slow_analysis(frame, frame_number, fps, *args, **kwargs):
+    """Stand-in classifier that takes longer than a frame interval"""
+
+    time.sleep(0.08)
+    return {
+        "frame_number": frame_number,
+        "timestamp_seconds": frame_number / fps,
+        "dominant_emotion": "happy",
+        "emotions": {emotion: 100.0 if emotion == "happy" else 0.0 for emotion in EMOTION_LABELS}
+    }
+
+
+def test_replay_accounts_for_every_frame(tmp_path, monkeypatch):
+    clip = write_clip(tmp_path / "clip.mp4", frames=60)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(realtime_stream, "analyze_frame_emotion", slow_analysis)
+
+    stats = realtime_stream.analyze_live_stream(str(clip), replay_realtime=True)
+
+    assert stats["frames_read"] == 60
+    assert stats["frames_analyzed"] > 0
+    assert (stats["frames_analyzed"] + stats["frames_skipped"] + stats["frames_skipped_cadence"]
+            + stats["frames_dropped_stale"] + stats["analysis_failures"] + stats["frames_pending"]
+            == stats["frames_read"])
+    # Inference is slower than the source, so frames must have been skipped
+    assert stats["frames_skipped"] > 0
+
+    latency = stats["latency_ms"]
+    assert latency["mean"] >= 80
+    assert latency["p50"] <= latency["p95"] <= latency["max"]
+    assert (tmp_path / "Output_Files" / "clip" / "emotion_analysis_clip.json").exists()
+
+
+def test_failures_are_counted(tmp_path, monkeypatch):
+    clip = write_clip(tmp_path / "clip.mp4", frames=30)
+    monkeypatch.chdir(tmp_path)
+
+    def failing_analysis(*args, **kwargs):
+        raise ValueError("no face")
+
+    monkeypatch.setattr(realtime_stream, "analyze_frame_emotion", failing_analysis)
+
+    stats = realtime_stream.analyze_live_stream(str(clip), replay_realtime=True)
+
+    assert stats["frames_read"] == 30
+    assert stats["frames_analyzed"] == 0
+    assert stats["analysis_failures"] > 0
+    assert (stats["frames_skipped"] + stats["frames_skipped_cadence"] + stats["frames_dropped_stale"]
+            + stats["analysis_failures"] + stats["frames_pending"] == stats["frames_read"])
+
+
+def test_live_timestamps_are_not_negative(tmp_path, monkeypatch):
+    clip = write_clip(tmp_path / "clip.mp4", frames=30)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(realtime_stream, "analyze_frame_emotion", slow_analysis)
+
+    # Without replay_realtime timestamps come from the wall clock
+    realtime_stream.analyze_live_stream(str(clip), stream_name="live")
+
+    from results_store import load_result_rows
+    rows = load_result_rows(str(tmp_path / "Output_Files" / "live" / "emotion_analysis_live.json"))
+    assert len(rows) > 0
+    assert np.all(rows["timestamp"] >= 0)
+
+
+def test_summarize_latencies():
+    assert realtime_stream.summarize_latencies([]) == {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    summary = realtime_stream.summarize_latencies([float(v) for v in range(1, 101)])
+    assert summary["mean"] == 50.5
+    assert summary["max"] == 100.0
+    assert 49 <= summary["p50"] <= 51
+    assert 94 <= summary["p95"] <= 96
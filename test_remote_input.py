@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tests for the range-request server and the prefetching remote source
+"""
+
+import os
+import sys
+import threading
+import types
+import urllib.parse
+from http.server import ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import pytest
+
+import analyze_with_output
+from remote_input import (LocalFileSource, PrefetchingRemoteSource, RangeRequestHandler, is_remote_url,
+                          remote_video_name, serve_directory)
+
+
+def parse_range(header, size):
+    """Run RangeRequestHandler._parse_range without a live connection"""
+
+    handler = RangeRequestHandler.__new__(RangeRequestHandler)
+    handler.headers = {"Range": header} if header is not None else {}
+    return handler._parse_range(size)
+
+
+def test_parse_range():
+    assert parse_range(None, 1000) is None
+    assert parse_range("items=0-10", 1000) is None
+    assert parse_range("bytes=0-0", 1000) == (0, 0)
+    assert parse_range("bytes=100-199", 1000) == (100, 199)
+    # Open-ended, clamped and suffix ranges
+    assert parse_range("bytes=900-", 1000) == (900, 999)
+    assert parse_range("bytes=900-5000", 1000) == (900, 999)
+    assert parse_range("bytes=-100", 1000) == (900, 999)
+    assert parse_range("bytes=-5000", 1000) == (0, 999)
+    # Only the first range of a multi-range request is honoured
+    assert parse_range("bytes=0-9, 20-29", 1000) == (0, 9)
+
+
+def test_url_helpers():
+    assert is_remote_url("https://bucket.example.com/videos/clip.mp4")
+    assert not is_remote_url("C:/videos/clip.mp4")
+    assert not is_remote_url(0)
+    assert remote_video_name("http://host/videos/my%20clip.mp4?token=abc") == "my%20clip"
+    assert remote_video_name("http://host/") == "remote_video"
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """A 1MB + 123 byte object behind serve_directory"""
+
+    data = os.urandom(1024 * 1024 + 123)
+    (tmp_path / "clip.mp4").write_bytes(data)
+    server = serve_directory(str(tmp_path))
+    url = f"http://127.0.0.1:{server.server_address[1]}/clip.mp4"
+    yield url, data
+    server.shutdown()
+    server.server_close()
+
+
+def test_prefetching_source_reads_match_origin(origin):
+    url, data = origin
+    source = PrefetchingRemoteSource(url, chunk_size=64 * 1024, read_ahead=2, max_cached_chunks=4)
+    try:
+        assert source.size == len(data)
+        assert source.num_chunks == 17
+
+        # Sequential read of the whole object
+        offset, read_back = 0, bytearray()
+        while offset < source.size:
+            block = source.read(offset, 100 * 1024)
+            assert block
+            read_back += block
+            offset += len(block)
+        assert bytes(read_back) == data
+
+        # Random access, including the short last chunk and past the end
+        for start in (5, 700 * 1024, len(data) - 10):
+            assert source.read(start, 7) == data[start:start + 7]
+        # Reads stop at the end of a chunk
+        assert source.read(64 * 1024 - 3, 7) == data[64 * 1024 - 3:64 * 1024]
+        assert source.read(len(data), 10) == b""
+
+        stats = source.stats()
+        assert stats["bytes_downloaded"] >= len(data)
+        assert stats["peak_cached_bytes"] <= source.max_cached_chunks * source.chunk_size
+    finally:
+        source.close()
+    assert not os.path.exists(source.cache_dir)
+
+
+def test_prefetching_source_missing_object(origin):
+    url, _ = origin
+    with pytest.raises(Exception):
+        PrefetchingRemoteSource(url.replace("clip.mp4", "missing.mp4"))
+
+
+class NoRangeHandler(RangeRequestHandler):
+    """Origin that ignores Range and always answers 200 with the whole object"""
+
+    def _parse_range(self, size):
+        return None
+
+
+class WrongRangeHandler(RangeRequestHandler):
+    """Origin that answers 206 but always with the whole object"""
+
+    def _parse_range(self, size):
+        return (0, size - 1) if self.headers.get("Range") else None
+
+
+@pytest.mark.parametrize("handler", [NoRangeHandler, WrongRangeHandler])
+def test_prefetching_source_requires_range_support(tmp_path, handler):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(os.urandom(4096))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.source = LocalFileSource(str(path))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/{urllib.parse.quote('clip.mp4')}"
+        with pytest.raises(IOError, match="range"):
+            PrefetchingRemoteSource(url, chunk_size=1024)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def write_clip(path, frames=30, fps=30.0, size=(160, 120)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), (i * 8) % 255, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def happy_analysis(frame, frame_number, fps, *args, **kwargs):
+    emotions = {emotion: 100.0 if emotion == "happy" else 0.0 for emotion in analyze_with_output.EMOTION_LABELS}
+    return {"frame_number": frame_number, "timestamp_seconds": frame_number / fps,
+            "dominant_emotion": "happy", "emotions": emotions}
+
+
+@pytest.fixture
+def remote_clip(tmp_path, monkeypatch):
+    """A served synthetic clip, a stand-in classifier and a DeepFace.stream that records its source"""
+
+    write_clip(tmp_path / "clip.mp4")
+    server = serve_directory(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analyze_with_output, "analyze_frame_emotion", happy_analysis)
+
+    stream_sources = []
+    deepface = types.ModuleType("deepface")
+    deepface.DeepFace = types.SimpleNamespace(stream=lambda source, **kwargs: stream_sources.append(source))
+    monkeypatch.setitem(sys.modules, "deepface", deepface)
+
+    yield f"http://127.0.0.1:{server.server_address[1]}/clip.mp4", stream_sources
+    server.shutdown()
+    server.server_close()
+
+
+def test_remote_input_skips_video_generation_by_default(tmp_path, remote_clip):
+    url, stream_sources = remote_clip
+    analyze_with_output.analyze_video_with_output(url)
+
+    assert stream_sources == []
+    assert (tmp_path / "Output_Files" / "clip" / "emotion_analysis_clip.json").exists()
+
+
+def test_remote_video_generation_reads_through_the_proxy(remote_clip):
+    url, stream_sources = remote_clip
+    analyze_with_output.analyze_video_with_output(url, generate_video=True)
+
+    assert len(stream_sources) == 1
+    assert stream_sources[0] != url
+    assert stream_sources[0].startswith("http://127.0.0.1:")
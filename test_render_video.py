@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for render-only mode: segment rendering and the single-worker path
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+import render_video
+from analyze_with_output import EMOTION_LABELS, generate_emotion_video, save_analysis_results
+from results_store import results_to_array
+
+
+def write_clip(path, frames=90, fps=30.0, size=(160, 120)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for i in range(frames):
+        frame = np.full((size[1], size[0], 3), (i * 2) % 255, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+def make_results(total_frames, interval=3, fps=30.0):
+    return [
+        {
+            "frame_number": frame_number,
+            "timestamp_seconds": frame_number / fps,
+            "dominant_emotion": "happy",
+            "emotions": {emotion: 100.0 if emotion == "happy" else 0.0 for emotion in EMOTION_LABELS}
+        }
+        for frame_number in range(0, total_frames, interval)
+    ]
+
+
+def frame_count(path):
+    cap = cv2.VideoCapture(path)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return count
+
+
+def test_generate_emotion_video_renders_requested_frames(tmp_path):
+    clip = write_clip(tmp_path / "clip.mp4", frames=90)
+    results = make_results(90)
+
+    whole = generate_emotion_video(clip, str(tmp_path / "whole.mp4"), results)
+    assert frame_count(whole) == 90
+
+    segment = generate_emotion_video(clip, str(tmp_path / "segment.mp4"), results, start_frame=30, end_frame=60)
+    assert frame_count(segment) == 30
+
+    # end_frame past the end of the clip is clamped
+    tail = generate_emotion_video(clip, str(tmp_path / "tail.mp4"), results, start_frame=75, end_frame=500)
+    assert frame_count(tail) == 15
+
+
+def test_segments_receive_only_their_rows():
+    rows = results_to_array(make_results(90))
+    segments = [(0, 30), (30, 60), (60, 90)]
+
+    per_segment = [render_video.rows_in_segment(rows, start, end) for start, end in segments]
+    for (start, end), segment_rows in zip(segments, per_segment):
+        assert len(segment_rows) == 10
+        assert np.all((segment_rows["frame_number"] >= start) & (segment_rows["frame_number"] < end))
+    assert sum(len(r) for r in per_segment) == len(rows)
+
+
+def test_render_single_worker(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clip = write_clip(tmp_path / "clip.mp4", frames=90)
+    results_path = str(tmp_path / "emotion_analysis_clip.json")
+    save_analysis_results(make_results(90), clip, results_path, str(tmp_path / "emotion_analysis_clip.csv"))
+
+    output_path = str(tmp_path / "rendered" / "clip_rendered.mp4")
+    rendered = render_video.render_from_results(clip, results_path=results_path, output_path=output_path,
+                                                num_workers=1)
+
+    assert rendered == output_path
+    assert frame_count(output_path) == 90
+    # Explicit paths: nothing is created under Output_Files/
+    assert not os.path.exists(tmp_path / "Output_Files")
+
+
+def test_missing_results_creates_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clip = write_clip(tmp_path / "clip.mp4", frames=10)
+
+    assert render_video.render_from_results(clip) is None
+    assert not os.path.exists(tmp_path / "Output_Files")
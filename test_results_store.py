@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Tests for the binary results store and the in-memory result buffer
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from analyze_with_output import EMOTION_LABELS, save_analysis_results
+from results_store import (HEADER_FORMAT, MAGIC, RESULT_DTYPE, STORE_DTYPE, FrameResultBuffer, ResultsStore,
+                           load_result_rows, load_video_info, results_to_array, rows_to_results,
+                           write_results_store)
+
+
+def make_result(frame_number, fps=30.0, dominant="happy"):
+    """One result dict in the JSON schema, with the dominant emotion scored highest"""
+
+    emotions = {emotion: 1.0 for emotion in EMOTION_LABELS}
+    emotions[dominant] = 100.0 - (len(EMOTION_LABELS) - 1)
+    return {
+        "frame_number": frame_number,
+        "timestamp_seconds": frame_number / fps,
+        "dominant_emotion": dominant,
+        "emotions": emotions
+    }
+
+
+def make_results(count, step=3, fps=30.0):
+    """count results on a 0.1s grid, cycling through the emotions"""
+
+    return [make_result(i * step, fps, EMOTION_LABELS[i % len(EMOTION_LABELS)]) for i in range(count)]
+
+
+def test_store_rows_are_aligned(tmp_path):
+    """The mapped timestamp column must be aligned so searchsorted works in place"""
+
+    path = write_results_store(make_results(50), str(tmp_path / "results.bin"))
+    store = ResultsStore(path)
+
+    assert STORE_DTYPE.itemsize == 48
+    assert os.path.getsize(path) == struct.calcsize(HEADER_FORMAT) + 50 * 48
+    assert isinstance(store.rows, np.memmap)
+    assert store.rows["timestamp"].flags.aligned
+    assert store.rows["scores"].flags.aligned
+
+
+def test_store_round_trip(tmp_path):
+    results = make_results(40)
+    store = ResultsStore(write_results_store(results, str(tmp_path / "results.bin")))
+
+    assert len(store) == 40
+    restored = store.to_results(store.rows)
+    for original, loaded in zip(results, restored):
+        assert loaded["frame_number"] == original["frame_number"]
+        assert loaded["timestamp_seconds"] == original["timestamp_seconds"]
+        assert loaded["dominant_emotion"] == original["dominant_emotion"]
+        for emotion in EMOTION_LABELS:
+            assert abs(loaded["emotions"][emotion] - original["emotions"][emotion]) < 1e-4
+
+
+def test_write_sorts_by_timestamp(tmp_path):
+    results = make_results(20)
+    store = ResultsStore(write_results_store(results[::-1], str(tmp_path / "results.bin")))
+
+    assert np.all(np.diff(store.rows["timestamp"]) > 0)
+
+
+def test_time_range(tmp_path):
+    # 100 points, 0.1s apart: 0.0 .. 9.9s
+    store = ResultsStore(write_results_store(make_results(100), str(tmp_path / "results.bin")))
+
+    rows = store.time_range(2, 3)
+    assert len(rows) == 10
+    assert rows["timestamp"][0] >= 2.0
+    assert rows["timestamp"][-1] < 3.0
+
+    assert len(store.time_range()) == 100
+    assert len(store.time_range(start=9.5)) == 5
+    assert len(store.time_range(end="0:01")) == 10
+    assert len(store.time_range(50, 60)) == 0
+
+
+def test_rollup_matches_per_bucket_mean(tmp_path):
+    results = make_results(100)
+    store = ResultsStore(write_results_store(results, str(tmp_path / "results.bin")))
+
+    bucket_starts, means = store.rollup(period=1.0)
+    assert list(bucket_starts) == [float(s) for s in range(10)]
+    assert means.shape == (10, len(EMOTION_LABELS))
+
+    for bucket, bucket_start in enumerate(bucket_starts):
+        in_bucket = [r for r in results if bucket_start <= r["timestamp_seconds"] < bucket_start + 1]
+        expected = [np.mean([r["emotions"][emotion] for r in in_bucket]) for emotion in EMOTION_LABELS]
+        assert np.allclose(means[bucket], expected, atol=1e-3)
+
+    bucket_starts, means = store.rollup(period=60.0)
+    assert list(bucket_starts) == [0.0]
+
+    bucket_starts, means = store.rollup(period=1.0, start=50)
+    assert len(bucket_starts) == 0
+    assert means.shape == (0, len(EMOTION_LABELS))
+
+
+def test_dominant_histogram(tmp_path):
+    results = make_results(70)
+    store = ResultsStore(write_results_store(results, str(tmp_path / "results.bin")))
+
+    histogram = store.dominant_histogram()
+    assert histogram == {emotion: 10 for emotion in EMOTION_LABELS}
+
+    # First second: the first 10 points cycle through all 7 emotions once, then 3 more
+    histogram = store.dominant_histogram(0, 1)
+    assert sum(histogram.values()) == 10
+    assert histogram[EMOTION_LABELS[0]] == 2
+    assert histogram[EMOTION_LABELS[-1]] == 1
+
+
+def test_empty_store(tmp_path):
+    store = ResultsStore(write_results_store([], str(tmp_path / "results.bin")))
+
+    assert len(store) == 0
+    assert len(store.time_range(0, 10)) == 0
+    assert sum(store.dominant_histogram().values()) == 0
+
+
+def test_old_store_version_falls_back_to_json(tmp_path):
+    results = make_results(10)
+    json_path = tmp_path / "emotion_analysis_clip.json"
+    json_path.write_text(json.dumps({"results": results}), encoding="utf-8")
+
+    # Packed version-1 store written after the JSON: rejected, JSON is used instead
+    bin_path = tmp_path / "emotion_analysis_clip.bin"
+    bin_path.write_bytes(struct.pack(HEADER_FORMAT, MAGIC, 1, 45, len(EMOTION_LABELS)) + b"\0" * 45 * 10)
+
+    rows = load_result_rows(str(json_path))
+    assert [r["frame_number"] for r in rows_to_results(rows)] == [r["frame_number"] for r in results]
+
+
+def test_load_prefers_up_to_date_store(tmp_path):
+    results = make_results(10)
+    json_path = tmp_path / "emotion_analysis_clip.json"
+    json_path.write_text(json.dumps({"results": results}), encoding="utf-8")
+    write_results_store(results_to_array(results), str(tmp_path / "emotion_analysis_clip.bin"))
+
+    rows = load_result_rows(str(json_path))
+    assert isinstance(rows, np.memmap)
+    assert len(rows) == 10
+
+
+def test_buffer_grows_past_capacity():
+    buffer = FrameResultBuffer(capacity=2)
+    results = make_results(37)
+    for result in results:
+        buffer.append(result)
+
+    assert len(buffer) == 37
+    assert buffer.array.dtype == RESULT_DTYPE
+    assert list(buffer.array["frame_number"]) == [r["frame_number"] for r in results]
+
+    buffer.extend(results_to_array(make_results(5)))
+    assert len(buffer) == 42
+
+
+def test_buffer_sort_orders_by_timestamp():
+    buffer = FrameResultBuffer()
+    results = make_results(10)
+    for result in results[5:] + results[:5]:
+        buffer.append(result)
+
+    buffer.sort()
+    assert list(buffer.array["frame_number"]) == [r["frame_number"] for r in results]
+    assert [r["dominant_emotion"] for r in rows_to_results(buffer.array)] == \
+        [r["dominant_emotion"] for r in results]
+
+
+def test_buffer_keeps_full_precision_scores():
+    result = make_result(0)
+    result["emotions"]["happy"] = 98.50304412841797123
+    result["emotions"]["disgust"] = 6.534902619037553e-10
+
+    buffer = FrameResultBuffer()
+    buffer.append(result)
+    restored = rows_to_results(buffer.array)[0]
+
+    assert restored["emotions"]["happy"] == result["emotions"]["happy"]
+    assert restored["emotions"]["disgust"] == result["emotions"]["disgust"]
+
+
+def test_saved_json_and_csv_keep_float64(tmp_path):
+    result = make_result(3)
+    result["emotions"]["happy"] = 98.50304412841797
+    json_output = str(tmp_path / "emotion_analysis_clip.json")
+    csv_output = str(tmp_path / "emotion_analysis_clip.csv")
+
+    save_analysis_results([result], "clip.mp4", json_output, csv_output,
+                          extra_info={"crop_cache": {"hit_rate": 0.25, "max_distance": 4}})
+
+    with open(json_output, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data["results"][0]["emotions"]["happy"] == 98.50304412841797
+
+    import pandas as pd
+    assert pd.read_csv(csv_output, float_precision="round_trip")["happy"][0] == 98.50304412841797
+
+    # Only the .bin store is narrowed to float32
+    store = ResultsStore(str(tmp_path / "emotion_analysis_clip.bin"))
+    assert store.rows["scores"].dtype == np.float32
+
+
+def test_load_video_info_reads_only_the_header_block(tmp_path):
+    json_output = str(tmp_path / "emotion_analysis_clip.json")
+    save_analysis_results(make_results(200), "clip.mp4", json_output, str(tmp_path / "clip.csv"),
+                          extra_info={"crop_cache": {"hit_rate": 0.5, "max_distance": 4}})
+
+    # Tiny chunks make the block span several reads
+    video_info = load_video_info(json_output, chunk_size=16)
+    assert video_info["crop_cache"] == {"hit_rate": 0.5, "max_distance": 4}
+    assert video_info["total_frames_analyzed"] == 200
+
+    no_info = tmp_path / "bare.json"
+    no_info.write_text(json.dumps({"results": []}), encoding="utf-8")
+    assert load_video_info(str(no_info)) == {}